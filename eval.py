@@ -5,8 +5,8 @@ eval.py
 For each guess in Co-ordle, this part of the bot will analyze its...
 1. SKILL - a score from 0-100 which is determined primarily by how much of the "solution space"
    that guess eliminates ON AVERAGE
-2. LUCK - a designation of 'GOOD', 'AVERAGE', or 'BAD', determined by how much of the "solution space"
-   that guess ACTUALLY eliminated, given the answer to the Co-ordle
+2. LUCK - a percentile of how much of the "solution space" that guess ACTUALLY eliminated, given the
+   answer to the Co-ordle, out of all the outcomes it could have had, summarized as 'GOOD', 'AVERAGE', or 'BAD'
         (For example, 'COCCYX' would usually return a low SKILL score, which is intuitive since it contains 
         some pretty uncommon letter combinations. However, if the answer to that Co-ordle just happens to be 
         'COCCYX', the LUCK would evaluate to 'GOOD' - i.e. "this guess is not very strategic, but in this 
@@ -23,8 +23,9 @@ which is saved as a file for quicker reference.
   3Blue1Brown (see readme for source), under CC BY-NC-SA 4.0 License. Modifications to original code include:
     - updated ternary representation of pattern with np.int64 (was np.uint8)
         - handles larger integers for 6-letter version of Wordle
-    - modified code which was hardcoded to 5 letters to LENGTH letters (global const)
-    - set word length as global constant (6) instead of determining length from first word of list
+    - modified code which was hardcoded to 5 letters to take the word length as a parameter
+      (LENGTH = 6 by default), with one pattern grid and vocabulary per length, loaded on first use
+      and dropped from memory again after STORE_IDLE_SECONDS unused
     - renamed functions/variables for clarity and preference
         - words_to_int_arrays -> wordsToInts
         - generate_pattern_matrix -> generatePatterns
@@ -39,17 +40,22 @@ ADDITIONAL NOTES:
 '''
 
 import os
-import re
+import sys
+import json
+import time
+import hashlib
 import numpy as np
 import itertools as it
 import discord
-import math
-from discord.ext import commands
+from concurrent.futures import ThreadPoolExecutor
+from discord.ext import tasks
 from discord.ui import Button, View
 from scipy.stats import entropy
 from dotenv import load_dotenv
+from utils import parseCoordle, makeBot
+from store import loadJson, saveJson, transaction
 
-LENGTH = 6
+LENGTH = 6 # default word length (Co-ordle)
 
 MISS = np.uint8(0)
 MISPLACED = np.uint8(1)
@@ -59,19 +65,32 @@ BAD = -1
 AVERAGE = 0
 GOOD = 1
 
+# luck percentile bounds for BAD / GOOD
+LUCK_BAD = 25
+LUCK_GOOD = 75
+
 PROJECT_FOLDER = os.path.dirname(__file__)
 STORAGE_FOLDER = os.path.join(PROJECT_FOLDER, 'storage')
 COORDLE_WORDLIST = os.path.join(STORAGE_FOLDER, 'CoordleWordlist.txt')
 COMMON_WL = os.path.join(STORAGE_FOLDER, 'Common6.txt')
 SCRABBLE_WORDLIST = os.path.join(STORAGE_FOLDER, 'ScrabbleWordlist.txt')
 PATTERNS_FILE = os.path.join(STORAGE_FOLDER, 'patterns.npy')
+BUNDLE_FILE = os.path.join(STORAGE_FOLDER, 'vocab.bin') # built from the two wordlists by saveBundle
+# other word lengths use Common{n}.txt, ScrabbleWordlist{n}.txt, patterns{n}.npy and vocab{n}.bin
+# (see getStorageFiles)
+EVAL_CACHE_FILE = os.path.join(STORAGE_FOLDER, 'evalCache.json')
+
+BUNDLE_ALIGN = 64 # byte alignment of each array in a bundle
+EVAL_CACHE_SIZE = 500 # max number of cached evals before the least recently used is dropped
+
+STORE_IDLE_SECONDS = 30 * 60 # pattern stores unused for this long are dropped from memory
 
-PATTERN_GRID = dict()
+ENTROPY_TILE_BYTES = 1 << 20 # pattern slice / pattern counts per entropy tile, sized to stay in cache
+ENTROPY_WORKERS = os.cpu_count() or 1
 
-# --------- COORDLE CONSTANTS --------- #
-EMBED_GREEN = '#78b159' # solved Co-ordle
-EMBED_RED = '#dd2e44' # unsolved Co-ordle
-COORDLE = 1071892566158614608
+PATTERN_STORES = dict() # word length -> {'grid', 'bundle', 'vocab', 'lastUsed'}, loaded on first use
+EVAL_CACHE = dict() # in-memory copy of EVAL_CACHE_FILE ('evals'), loaded on first use, and keys read since it was saved ('used')
+ENTROPY_POOL = dict() # thread pool for getEntropies, started on first use
 
 # BOT STUFF
 load_dotenv()
@@ -87,119 +106,358 @@ def getWordlist(file):
         wordlist.extend([word.strip() for word in f.readlines()])
     return wordlist
 
-def getPriors(solutions): # credit: 3B1B
-    # returns dict of all guess words with 1s correponding to answer words
-    guessWords = getWordlist(SCRABBLE_WORDLIST)
-    return dict(
-        (w, int(w in solutions))
-        for w in guessWords
+def getStorageFiles(length=LENGTH):
+    # common wordlist, Scrabble wordlist and pattern grid files for a word length
+    if length == LENGTH:
+        return COMMON_WL, SCRABBLE_WORDLIST, PATTERNS_FILE
+    return (
+        os.path.join(STORAGE_FOLDER, f'Common{length}.txt'),
+        os.path.join(STORAGE_FOLDER, f'ScrabbleWordlist{length}.txt'),
+        os.path.join(STORAGE_FOLDER, f'patterns{length}.npy')
     )
 
-def generatePatternsGrid(guesses, answers): # adapted from 3B1B
+def getBundleFile(length=LENGTH):
+    return BUNDLE_FILE if length == LENGTH else os.path.join(STORAGE_FOLDER, f'vocab{length}.bin')
+
+def packWords(words, length=LENGTH):
+    '''
+    Packs each word into a single integer, 5 bits per letter (A=1 ... Z=26), so 30 bits for
+    6 letters. Words that are not length letters long are packed as 0
+
+    Parameters
+        words: list of words
+        length: word length (up to 12)
+    Return
+        codes: np.uint32 array (np.uint64 for words over 6 letters)
+    '''
+    dtype = np.uint32 if length <= 6 else np.uint64
+    words = np.char.upper(np.asarray(words, dtype=str))
+    letters = words.astype(f'<U{length}').view(np.uint32).reshape(len(words), length)
+    letters = np.where(letters > 0, letters - (ord('A') - 1), 0) & 31
+    shifts = (5 * np.arange(length)).astype(dtype)
+    codes = (letters.astype(dtype) << shifts).sum(axis=1, dtype=dtype)
+    codes[np.char.str_len(words) != length] = 0
+    return codes
+
+class Vocabulary:
+    '''
+    Maps each word of a wordlist to a dense integer ID (its position in the list, which is also
+    its row/column in the pattern grid) and a packed code from packWords, so sets of words can
+    be passed around as arrays of IDs or boolean masks instead of lists of strings
+    '''
+    def __init__(self, words, length=LENGTH):
+        self.length = length
+        self.words = np.array(words)
+        self.codes = packWords(words, length)
+        self.sortedIDs = np.argsort(self.codes, kind='stable')
+        self.sortedCodes = self.codes[self.sortedIDs]
+
+    @classmethod
+    def fromBundle(cls, bundle):
+        # vocabulary over the (memory mapped) arrays of a bundle from loadBundle, nothing recomputed
+        vocab = cls.__new__(cls)
+        vocab.length = bundle['length']
+        vocab.words = bundle['words']
+        vocab.codes = bundle['codes']
+        vocab.sortedIDs = bundle['sortedIDs']
+        vocab.sortedCodes = bundle['sortedCodes']
+        return vocab
+
+    def __len__(self):
+        return len(self.words)
+
+    def find(self, words):
+        '''
+        Gets the IDs of a list of words, -1 for words not in the vocabulary
+        '''
+        codes = packWords(words, self.length)
+        if len(self) == 0:
+            return np.full(len(codes), -1)
+        pos = np.searchsorted(self.sortedCodes, codes).clip(max=len(self) - 1)
+        return np.where((self.sortedCodes[pos] == codes) & (codes != 0), self.sortedIDs[pos], -1)
+
+    def getIDs(self, words):
+        '''
+        Gets the IDs of a list of words, raising KeyError if any are not in the vocabulary
+        '''
+        ids = self.find(words)
+        if (ids < 0).any():
+            missing = [word for word, i in zip(words, ids) if i < 0]
+            raise KeyError(f"Not in wordlist: {', '.join(missing)}")
+        return ids
+
+    def getWords(self, ids):
+        return self.words[ids].tolist()
+
+    def toMask(self, ids):
+        mask = np.zeros(len(self), dtype=bool)
+        mask[ids] = True
+        return mask
+
+def getPriors(vocab, solutionIDs): # credit: 3B1B
+    # returns array over the whole vocabulary with 1s correponding to answer words
+    # (vocab passed in, as the bundle it is stored in is built from it - see saveBundle)
+    return vocab.toMask(solutionIDs).astype(np.int64)
+
+# --------- VOCABULARY BUNDLE --------- #
+def hashFile(path):
+    with open(path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+def getSourceStats(length=LENGTH):
+    # [size, mtime] of the wordlists a bundle is built from, to tell when it is out of date
+    commonFile, scrabbleFile, patternsFile = getStorageFiles(length)
+    stats = {}
+    for path in (commonFile, scrabbleFile):
+        stat = os.stat(path)
+        stats[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+    return stats
+
+def saveBundle(length=LENGTH):
+    '''
+    Builds the binary vocabulary bundle of a word length from its Scrabble and common wordlists,
+    so commands only have to memory map it (see loadBundle) instead of parsing the wordlists.
+    The file is a JSON header (preceded by its size as 8 bytes) followed by the arrays, each
+    aligned to BUNDLE_ALIGN bytes
+        words, codes, sortedIDs, sortedCodes: Vocabulary arrays of the Scrabble wordlist
+        letters: wordsToInts of the Scrabble wordlist
+        solutionIDs: vocabulary IDs of the common wordlist (possible solutions)
+        priors: getPriors of solutionIDs
+    The header also holds the md5 of both wordlists and their sizes/mtimes
+
+    Parameter
+        length: word length
+    '''
+    commonFile, scrabbleFile, patternsFile = getStorageFiles(length)
+    vocab = Vocabulary(getWordlist(scrabbleFile), length)
+    solutionIDs = vocab.getIDs(getWordlist(commonFile))
+    arrays = {
+        'words': vocab.words,
+        'codes': vocab.codes,
+        'sortedIDs': vocab.sortedIDs,
+        'sortedCodes': vocab.sortedCodes,
+        'letters': wordsToInts(vocab.words).reshape(len(vocab), length),
+        'solutionIDs': solutionIDs,
+        'priors': getPriors(vocab, solutionIDs)
+    }
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, list(array.shape), offset]
+        offset += -(-array.nbytes // BUNDLE_ALIGN) * BUNDLE_ALIGN
+    header = json.dumps({
+        'length': length,
+        'hashes': {os.path.basename(path): hashFile(path) for path in (commonFile, scrabbleFile)},
+        'sources': getSourceStats(length),
+        'arrays': layout
+    }).encode()
+    start = -(-(8 + len(header)) // BUNDLE_ALIGN) * BUNDLE_ALIGN
+
+    bundleFile = getBundleFile(length)
+    tempFile = f'{bundleFile}.{os.getpid()}.tmp'
+    with open(tempFile, 'wb') as f:
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(start + layout[name][2])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(start + offset)
+    os.replace(tempFile, bundleFile)
+
+def loadBundle(length=LENGTH):
+    '''
+    Memory maps the vocabulary bundle of a word length
+
+    Parameter
+        length: word length
+    Return
+        bundle: dict of the header entries and the arrays (read-only views into the file),
+                None if there is no bundle or its wordlists changed since it was built
+    '''
+    try:
+        data = np.memmap(getBundleFile(length), dtype=np.uint8, mode='r')
+    except (FileNotFoundError, ValueError):
+        return None
+    size = int(data[:8].view(np.uint64)[0])
+    header = json.loads(data[8:8 + size].tobytes())
+    if header['sources'] != getSourceStats(length):
+        return None
+
+    start = -(-(8 + size) // BUNDLE_ALIGN) * BUNDLE_ALIGN
+    bundle = {'length': header['length'], 'hashes': header['hashes']}
+    for name, (dtype, shape, offset) in header['arrays'].items():
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape)) * dtype.itemsize
+        bundle[name] = data[start + offset:start + offset + count].view(dtype).reshape(shape)
+    return bundle
+
+def getBundle(length=LENGTH):
+    # loads the bundle of a word length, (re)building it first if missing or out of date
+    bundle = loadBundle(length)
+    if bundle is None:
+        with transaction():
+            bundle = loadBundle(length) # another process may have rebuilt it while we waited
+            if bundle is None:
+                saveBundle(length)
+                bundle = loadBundle(length)
+    return bundle
+
+def generatePatternsGrid(guesses, answers, length=LENGTH): # adapted from 3B1B
+    '''
+    guesses and answers as lists of words, or as letter arrays from wordsToInts
+    '''
     numGuesses = len(guesses)
     numAnswers = len(answers)
 
-    guessInts, answerInts = map(wordsToInts, (guesses, answers))
-    matchGrid = np.zeros((numGuesses, numAnswers, LENGTH, LENGTH), dtype=bool)
-    for i, j in it.product(range(LENGTH), range(LENGTH)):
+    guessInts, answerInts = (
+        words if isinstance(words, np.ndarray) and words.dtype == np.uint8 else wordsToInts(words)
+        for words in (guesses, answers)
+    )
+    matchGrid = np.zeros((numGuesses, numAnswers, length, length), dtype=bool)
+    for i, j in it.product(range(length), range(length)):
         matchGrid[:, :, i, j] = np.equal.outer(guessInts[:, i], answerInts[:, j])
     
-    patterns = np.zeros((numGuesses, numAnswers, LENGTH), dtype=np.uint8)
-    for i in range(LENGTH):
+    patterns = np.zeros((numGuesses, numAnswers, length), dtype=np.uint8)
+    for i in range(length):
         matches = matchGrid[:, :, i, i].flatten()
         patterns[:, :, i].flat[matches] = EXACT
 
-        for k in range(LENGTH):
+        for k in range(length):
             matchGrid[:, :, k, i].flat[matches] = False
             matchGrid[:, :, i, k].flat[matches] = False
     
-    for i, j in it.product(range(LENGTH), range(LENGTH)):
+    for i, j in it.product(range(length), range(length)):
         matches = matchGrid[:, :, i, j].flatten()
         patterns[:, :, i].flat[matches] = MISPLACED
-        for k in range(LENGTH):
+        for k in range(length):
             matchGrid[:, :, k, j].flat[matches] = False
             matchGrid[:, :, i, k].flat[matches] = False
     
     patternsToInt = np.dot(
         patterns,
-        (3**np.arange(LENGTH)).astype(np.int64) # changed uint8 -> int64
+        (3**np.arange(length)).astype(np.int64) # changed uint8 -> int64
     )
 
     return patternsToInt
 
-def savePatterns():
-    wordlist = getWordlist(SCRABBLE_WORDLIST)
-    patterns = generatePatternsGrid(wordlist, wordlist)
-    np.save(PATTERNS_FILE, patterns)
-
-def intToPattern(pattern): # adapted from 3B1B
+def savePatterns(length=LENGTH):
+    commonFile, scrabbleFile, patternsFile = getStorageFiles(length)
+    letters = getBundle(length)['letters']
+    patterns = generatePatternsGrid(letters, letters, length)
+    # swapped in whole, as running processes memory map the current file
+    tempFile = f'{patternsFile}.{os.getpid()}.tmp'
+    with open(tempFile, 'wb') as f:
+        np.save(f, patterns)
+    with transaction():
+        os.replace(tempFile, patternsFile)
+
+def intToPattern(pattern, length=LENGTH): # adapted from 3B1B
     result = []
     curr = pattern
-    for x in range(LENGTH):
+    for x in range(length):
         result.append(curr % 3)
         curr = curr // 3
     return result
 
-def patternToString(pattern): # adapted from 3B1B
+def patternToString(pattern, length=LENGTH): # adapted from 3B1B
     color = {MISS: '⬛', MISPLACED: '🟨', EXACT: '🟩'}
-    return ''.join(color[letter] for letter in intToPattern(pattern))
-
-def getPatterns(guesses, answers): # adapted from 3B1B
-    PATTERN_GRID['grid'] = np.load(PATTERNS_FILE)
-    PATTERN_GRID['index'] = dict(zip(
-        getWordlist(SCRABBLE_WORDLIST), it.count()
-    ))
-
-    grid = PATTERN_GRID['grid']
-    index = PATTERN_GRID['index']
+    return ''.join(color[letter] for letter in intToPattern(pattern, length))
 
-    indexGuesses = [index[word] for word in guesses]
-    indexAnswers = [index[word] for word in answers]
-
-    return grid[np.ix_(indexGuesses, indexAnswers)]
+def getPatternStore(length=LENGTH):
+    '''
+    Gets the pattern grid, vocabulary bundle and vocabulary (Scrabble wordlist) for a word length,
+    loading them on first use. Stores of other lengths that have been idle for STORE_IDLE_SECONDS
+    are dropped
 
-def getPattern(guess, answer): # adapted from 3B1B
-    index = PATTERN_GRID['index']
-    if guess in index and answer in index:
-        return getPatterns([guess], [answer])[0, 0]
+    Parameter
+        length: word length
+    Return
+        store: dict of 'grid', 'bundle', 'vocab' and 'lastUsed'
+    '''
+    now = time.monotonic()
+    evictIdleStores(now)
+    if length not in PATTERN_STORES:
+        commonFile, scrabbleFile, patternsFile = getStorageFiles(length)
+        bundle = getBundle(length)
+        PATTERN_STORES[length] = {
+            'grid': np.load(patternsFile, mmap_mode='r'), # shared between processes via the page cache
+            'bundle': bundle,
+            'vocab': Vocabulary.fromBundle(bundle)
+        }
+    store = PATTERN_STORES[length]
+    store['lastUsed'] = now
+    return store
+
+def evictIdleStores(now=None):
+    now = time.monotonic() if now is None else now
+    for length, store in list(PATTERN_STORES.items()):
+        if now - store['lastUsed'] > STORE_IDLE_SECONDS:
+            del PATTERN_STORES[length]
+
+def getVocabulary(length=LENGTH):
+    return getPatternStore(length)['vocab']
+
+def getGrid(length=LENGTH):
+    return getPatternStore(length)['grid']
+
+def getPatternsByIDs(guessIDs, answerIDs, length=LENGTH):
+    return getGrid(length)[np.ix_(guessIDs, answerIDs)]
+
+def getPatterns(guesses, answers, length=LENGTH): # adapted from 3B1B
+    vocab = getVocabulary(length)
+    return getPatternsByIDs(vocab.getIDs(guesses), vocab.getIDs(answers), length)
+
+def getPattern(guess, answer, length=LENGTH): # adapted from 3B1B
+    guessID, answerID = getVocabulary(length).find([guess, answer])
+    if guessID >= 0 and answerID >= 0:
+        return getGrid(length)[guessID, answerID]
     return None
 
-def getRemainingWords(guess, pattern, solutions): # adapted from 3B1B
-    allPatterns = getPatterns([guess], solutions).flatten()
-    return list(np.array(solutions)[allPatterns == pattern])
+def getRemainingIDs(guessID, pattern, solutionIDs, length=LENGTH):
+    allPatterns = getGrid(length)[guessID, solutionIDs]
+    return solutionIDs[allPatterns == pattern]
+
+def getRemainingWords(guess, pattern, solutions, length=LENGTH): # adapted from 3B1B
+    vocab = getVocabulary(length)
+    remaining = getRemainingIDs(vocab.getIDs([guess])[0], pattern, vocab.getIDs(solutions), length)
+    return vocab.getWords(remaining)
 
 def patternArrayToInt(array): # adapted from 3B1B
-    return np.dot(array, 3**np.arange(LENGTH).astype(np.int64))
+    length = np.shape(array)[-1]
+    return np.dot(array, 3**np.arange(length).astype(np.int64))
 
-def getPatternBuckets(guess, possibleWords): # adapted from 3B1B
+def getPatternBuckets(guess, possibleWords, length=LENGTH): # adapted from 3B1B
     '''
-    For each guess, there are 3^LENGTH (in this case, 3^6) possible pattern results.
+    For each guess, there are 3^length (for Co-ordle, 3^6) possible pattern results.
     This function groups a set of possible solutions by the pattern that the guess would generate
     '''
-    buckets = [[] for x in range(3**LENGTH)] # number of possible patterns
-    hashes = getPatterns([guess], possibleWords).flatten()
+    buckets = [[] for x in range(3**length)] # number of possible patterns
+    vocab = getVocabulary(length)
+    hashes = getPatternsByIDs(vocab.getIDs([guess]), vocab.getIDs(possibleWords), length).flatten()
     for index, word in zip(hashes, possibleWords):
         buckets[index].append(word)
     return buckets
 
-def getWeights(words, priors): # adapted from 3B1B
+def getWeights(ids, priors): # adapted from 3B1B
     # returns relative weights of a set of answer words (really, all equal
     # since the Co-ordle wordlist has equal chance of being answers)
-    frequencies = np.array([priors[word] for word in words])
+    frequencies = priors[ids]
     total = frequencies.sum()
     if total == 0:
         return np.zeros(frequencies.shape)
     return frequencies / total
 
-def getPatternDistribution(allowedGuesses, answers, weights): # adapted from 3B1B
+def getPatternDistribution(allowedGuesses, answers, weights, length=LENGTH): # adapted from 3B1B
     '''
     Returns an array of arrays, one for each possible guess (Scrabble wordlist),
-    with the % likelihood of seeing the patterns [0 1 ... 3^LENGTH]
+    with the % likelihood of seeing the patterns [0 1 ... 3^length]
+    (guesses and answers as vocabulary IDs)
     '''
-    patternGrid = getPatterns(allowedGuesses, answers)
+    patternGrid = getPatternsByIDs(allowedGuesses, answers, length)
 
     n = len(allowedGuesses)
-    distribution = np.zeros((n, 3**LENGTH))
+    distribution = np.zeros((n, 3**length))
     n_range = np.arange(n)
     for j, prob in enumerate(weights):
         distribution[n_range, patternGrid[:, j]] += prob
@@ -209,100 +467,173 @@ def entropyOfDistribution(distribution, atol=1e-12): # adapted from 3B1B
     axis = len(distribution.shape) - 1
     return entropy(distribution, base=2, axis=axis)
 
-def getEntropies(allowed_words, possible_words, weights): # adapted from 3B1B
-    if weights.sum() == 0:
-        return np.zeros(len(allowed_words))
-    distribution = getPatternDistribution(allowed_words, possible_words, weights)
-    return entropyOfDistribution(distribution)
-
-# --------- UTILS --------- # (to be moved to dedicated utils file)
-def isSolvedCoordle(message):
+def getTileEntropies(grid, guessIDs, answerIDs, weights, length=LENGTH, keep=None):
     '''
-    Determines if a message is a Co-ordle and whether it is solved or unsolved
-    
-    Parameter
-        message: Discord message
-    Returns
-        True: is Co-ordle, solved
-        False: is Co-ordle, unsolved
-        None: not a Co-ordle
-    '''
-    if message.author.id == COORDLE and message.embeds:
-        embed = message.embeds[0]
-        if str(embed.color) == EMBED_GREEN:
-            return True
-        elif str(embed.color) == EMBED_RED:
-            return False
-    return None
-
-def getSolved(coordle):
+    Entropies of one tile of guesses. The tile's pattern counts are found with a single bincount
+    (each row's patterns offset into its own block of 3^length), so only a (tile, 3^length)
+    array is ever held, in float32
+
+    Parameters
+        grid: pattern grid
+        guessIDs: vocabulary IDs of the tile's guesses
+        answerIDs: vocabulary IDs of possible solutions
+        weights: weights of the possible solutions (None if they are all equal)
+        length: word length
+        keep: index in guessIDs of a guess whose pattern distribution to return too (optional)
+    Return
+        entropies: np.float32 array, one per guess
+        distribution: likelihood of each of the 3^length patterns for the kept guess (only if keep is given)
     '''
-    Gets solution from solved Co-ordle
-
-    Parameter
-        coordle: message containing solved Co-ordle 
+    numPatterns = 3**length
+    patterns = grid[np.ix_(guessIDs, answerIDs)]
+    patterns += (np.arange(len(guessIDs)) * numPatterns)[:, None]
+    size = len(guessIDs) * numPatterns
+    kept = slice(keep * numPatterns, (keep + 1) * numPatterns) if keep is not None else None
+
+    if weights is None:
+        # H = log2(n) - sum(c log2 c) / n, with integer counts c of each pattern
+        counts = np.bincount(patterns.ravel(), minlength=size).astype(np.float32)
+        n = len(answerIDs)
+        distribution = counts[kept] / n if kept is not None else None
+        counts *= np.log2(np.maximum(counts, 1))
+        entropies = np.log2(np.float32(n)) - counts.reshape(-1, numPatterns).sum(axis=1) / n
+    else:
+        probs = np.bincount(
+            patterns.ravel(), weights=np.tile(weights, len(guessIDs)), minlength=size
+        ).astype(np.float32)
+        probs /= weights.sum()
+        distribution = probs[kept].copy() if kept is not None else None
+        probs *= -np.log2(np.where(probs > 0, probs, 1))
+        entropies = probs.reshape(-1, numPatterns).sum(axis=1)
+    return entropies if keep is None else (entropies, distribution)
+
+def getEntropyPool():
+    if 'pool' not in ENTROPY_POOL:
+        ENTROPY_POOL['pool'] = ThreadPoolExecutor(max_workers=ENTROPY_WORKERS)
+    return ENTROPY_POOL['pool']
+
+def getEntropies(allowed_words, possible_words, weights, length=LENGTH, keep=None):
+    '''
+    Expected information (in bits) of each guess - same result as entropyOfDistribution of
+    getPatternDistribution (within float32 tolerance), but worked out in cache-sized tiles of
+    guesses spread over a thread pool, without building the full distribution (peak memory is a
+    few ENTROPY_TILE_BYTES per worker, however many possible solutions are left)
+
+    Parameters
+        allowed_words: vocabulary IDs of guesses
+        possible_words: vocabulary IDs of possible solutions
+        weights: weights of the possible solutions, from getWeights
+        length: word length
+        keep: vocabulary ID of a guess (in allowed_words) whose pattern distribution to return too,
+              taken from the same pattern counts as the entropies (optional)
     Return
-        word: solution
+        entropies: np.float32 array, one per guess
+        distribution: likelihood of each of the 3^length patterns for the kept guess (only if keep is given)
     '''
-    embed = coordle.embeds[0]
-    description = embed.description or ""
-    found = description.strip().split('\n')[-1] # i.e. last guess
-    letters = re.findall(r':\w+_([a-zA-Z]):', found) # gets letters from emotes
-    word = ''.join(letters)
-    return word.upper()
-
-def getUnsolved(coordle):
+    allowed_words = np.asarray(allowed_words)
+    possible_words = np.asarray(possible_words)
+    entropies = np.zeros(len(allowed_words), dtype=np.float32)
+    distribution = np.zeros(3**length, dtype=np.float32)
+    if weights.sum() == 0 or len(possible_words) == 0:
+        return entropies if keep is None else (entropies, distribution)
+    if np.all(weights == weights[0]):
+        weights = None # equally likely solutions - count patterns as integers
+
+    grid = getGrid(length)
+    # a tile holds each guess's pattern slice and its 3^length pattern counts (int64 / float64
+    # from bincount) - sized by whichever is larger, so few possible solutions don't make one huge tile
+    guessBytes = max(len(possible_words) * grid.itemsize, 3**length * 8)
+    tileSize = max(1, ENTROPY_TILE_BYTES // guessBytes)
+    starts = range(0, len(allowed_words), tileSize)
+    kept = np.flatnonzero(allowed_words == keep)[0] if keep is not None else -1
+    tiles = getEntropyPool().map(
+        lambda start: getTileEntropies(
+            grid, allowed_words[start:start + tileSize], possible_words, weights, length,
+            kept - start if start <= kept < start + tileSize else None
+        ),
+        starts
+    )
+    for start, tile in zip(starts, tiles):
+        if start <= kept < start + tileSize:
+            tile, distribution = tile
+        entropies[start:start + len(tile)] = tile
+    return entropies if keep is None else (entropies, distribution)
+
+# --------- EVAL CACHE --------- #
+def getEvalVersion(length=LENGTH):
     '''
-    Gets solution from unsolved Co-ordle
+    Gets a short version string for the wordlists (their content hashes, from the bundle) and
+    pattern grid of a word length, so cached evals are not served once any of them change
 
     Parameter
-        coordle: message containing unsolved Co-ordle
+        length: word length
     Return
-        Solution
+        version: 8 hex characters
     '''
-    embed = coordle.embeds[0]
-    solution = embed.fields[-2].value # custom to Co-ordle structure
-    word = re.search(r'`(\w+)`', solution)
-    if word:
-        return word.group(1)
-    raise ValueError("Solution not found")
-
-def getSolution(coordle):
+    version = hashlib.md5()
+    for name, digest in sorted(getPatternStore(length)['bundle']['hashes'].items()):
+        version.update(f'{name}:{digest};'.encode())
+    stat = os.stat(getStorageFiles(length)[2])
+    version.update(f'{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return version.hexdigest()[:8]
+
+def getEvalKey(messageID, length=LENGTH):
+    return f'{messageID}:{getEvalVersion(length)}'
+
+def loadEvalCache():
+    if 'evals' not in EVAL_CACHE:
+        EVAL_CACHE['evals'] = loadJson(EVAL_CACHE_FILE)
+    return EVAL_CACHE['evals']
+
+def getCachedEval(key):
     '''
-    Gets solutions from solved and unsolved Co-ordles
+    Gets a cached eval and marks it as most recently used. On a miss the cache is reloaded, in
+    case another process (shard) cached it since
 
     Parameter
-        coordles: list of Co-ordle embeds
+        key: eval key from getEvalKey
     Return
-        solutions: list of solutions
+        result: dict of guesses, skills, lucks, percentiles and bests (None if not cached)
     '''
-    if isSolvedCoordle(coordle):
-        return getSolved(coordle)
-    else:
-        return getUnsolved(coordle)
+    cache = loadEvalCache()
+    if key not in cache:
+        cache = EVAL_CACHE['evals'] = loadJson(EVAL_CACHE_FILE)
+    result = cache.get(key)
+    if result is not None:
+        used = EVAL_CACHE.setdefault('used', dict())
+        used.pop(key, None)
+        used[key] = True # moved to the end (most recent) by the next cacheEval
+    return result
 
-def getGuesses(coordle):
-    embed = coordle.embeds[0]
-    description = embed.description or ""
-    content = description.strip().split('\n')
+def cacheEval(key, result):
+    '''
+    Saves an eval to the cache, dropping the least recently used ones past EVAL_CACHE_SIZE.
+    The cache is reloaded first (for other processes' evals), then the evals this process read
+    since its last save are moved to the end, in the order they were read
 
-    regexPattern = re.compile(r':\w+_([a-zA-Z]):')
-    guesses = []
-    
-    for row in content:
-        guess = ''.join(regexPattern.findall(row))
-        guesses.append(guess.upper())
-    
-    return guesses
+    Parameters
+        key: eval key from getEvalKey
+        result: dict of guesses, skills, lucks, percentiles and bests
+    '''
+    with transaction():
+        cache = EVAL_CACHE['evals'] = loadJson(EVAL_CACHE_FILE) # with other processes' evals
+        for used in EVAL_CACHE.pop('used', dict()):
+            if used in cache:
+                cache[used] = cache.pop(used)
+        cache.pop(key, None)
+        cache[key] = result
+        while len(cache) > EVAL_CACHE_SIZE:
+            del cache[next(iter(cache))] # oldest first
+        saveJson(EVAL_CACHE_FILE, cache)
 
 # --------- EVAL CALCULATIONS --------- #
-def getSkillScore(guess, expectedEntropies, possibleSols):
-    actual = expectedEntropies[guess]
+def getSkillScore(guessID, expectedEntropies, possibleIDs):
+    # expectedEntropies is indexed by vocabulary ID
+    actual = expectedEntropies[guessID]
     print("actual: " + str(actual))
-    rankings = sorted(expectedEntropies.items(), key=lambda x: x[1], reverse=True)
-    optimal = rankings[0][1]
+    optimal = expectedEntropies.max()
     weighingFactor = 1
-    if guess not in possibleSols:
+    if guessID not in possibleIDs:
         # this weighing factor penalizes guesses that could NOT POSSIBLY BE a solution, 
         # given the pattern information we already have. The extent of the penalty 
         # depends on how many possible solutions there are left - 
@@ -311,39 +642,37 @@ def getSkillScore(guess, expectedEntropies, possibleSols):
         # significantly, and will receive minimal penalty. However, if there are only
         # few solutions left, it is less strategic to make such a guess, so it would 
         # receive a greater penalty. 
-        weighingFactor = 1-1/len(possibleSols)
+        weighingFactor = 1-1/len(possibleIDs)
 
     infoRatio = actual / optimal if optimal != 0 else 1
 
     return round(infoRatio * weighingFactor * 100)
 
-def expectedEntropies(guesses, possibleAnswers, priors):
-    weights = getWeights(possibleAnswers, priors)
-    entropies = getEntropies(guesses, possibleAnswers, weights)
-    expectedEntropies = dict(zip(guesses, entropies))
-
-    return expectedEntropies
-
-def actualEntropy(guess, answer, possibleSols):
-    # shortcut method, since for Co-ordle we can assume uniformity of prior distribution
-    # (i.e. I'm not taking into account likelihood of a word as an answer
-    # based on its popularity.)
-    remainingSols = getRemainingWords(guess, getPattern(guess, answer), possibleSols)
-
-    return math.log2(len(possibleSols)/len(remainingSols))
+def getLuckPercentile(pattern, distribution):
+    '''
+    Ranks the outcome the guess actually got among all the outcomes it could have had.
+    An outcome gives more information the less likely its pattern is, so the percentile is the
+    chance of seeing a more likely pattern (counting ties as half)
 
-def getLuckScore(guess, answer, rankings, possibleSols):
-    expected = rankings[guess]
-    actual = actualEntropy(guess, answer, possibleSols)
+    Parameters
+        pattern: pattern the guess actually got
+        distribution: likelihood of each pattern for the guess, from getEntropies (keep=guess)
+    Return
+        percentile from 0-100
+    '''
+    if distribution.sum() == 0:
+        return 50
+    actual = distribution[pattern]
 
-    diff = actual - expected
+    below = distribution[distribution > actual].sum() + distribution[distribution == actual].sum() / 2
+    return round(below * 100)
 
-    if abs(diff) <= 1:  # within 1 bit
-        return AVERAGE
-    elif diff < -1:  # more than 1 bit below expected
+def getLuckScore(percentile):
+    if percentile < LUCK_BAD:
         return BAD
-    else:  # more than 1 bit above expected
+    elif percentile > LUCK_GOOD:
         return GOOD
+    return AVERAGE
 
 def explanation(skill, luck):
     if skill < 50:
@@ -365,33 +694,102 @@ def explanation(skill, luck):
     )
     return sentence
 
-def getBestGuesses(guess, expectedEntropies, possibleSols, rankLength):
-    inSols = [word for word in expectedEntropies if word in possibleSols and word != guess]
-    rankings = sorted(((word, expectedEntropies[word]) for word in inSols), key=lambda x: x[1], reverse=True)
+def getBestGuesses(guessID, expectedEntropies, possibleIDs, rankLength, length=LENGTH):
+    inSols = np.sort(possibleIDs[possibleIDs != guessID])
+    rankings = inSols[np.argsort(-expectedEntropies[inSols], kind='stable')]
 
-    bestGuesses = [w for w, _ in rankings[:rankLength]]
+    bestGuesses = getVocabulary(length).getWords(rankings[:rankLength])
     return bestGuesses
 
+def getEvaluation(guesses, solution):
+    '''
+    Evaluates each guess of a Co-ordle
+
+    Parameters
+        guesses: list of guesses, in order
+        solution: solution to the Co-ordle (its length picks the pattern store)
+    Return
+        result: dict of guesses, skills, lucks, percentiles and bests (one entry per guess)
+    '''
+    length = len(solution)
+    store = getPatternStore(length)
+    vocab, grid = store['vocab'], store['grid']
+    possibleIDs = store['bundle']['solutionIDs']
+    guessIDs = np.arange(len(vocab)) # whole Scrabble wordlist
+    priors = store['bundle']['priors']
+    solutionID = vocab.getIDs([solution])[0]
+
+    skillScores = []
+    luckScores = []
+    percentiles = []
+    bests = []
+
+    for guess, guessID in zip(guesses, vocab.getIDs(guesses)):
+        pattern = grid[guessID, solutionID]
+        weights = getWeights(possibleIDs, priors)
+        expEntrs, distribution = getEntropies(guessIDs, possibleIDs, weights, length, keep=guessID)
+        bestGuesses = getBestGuesses(guessID, expEntrs, possibleIDs, 5, length)
+        bests.append(bestGuesses)
+
+        print(bests)
+        print()
+
+        # skill score
+        skill = getSkillScore(guessID, expEntrs, possibleIDs)
+        skillScores.append(skill)
+
+        # luck score
+        percentile = getLuckPercentile(pattern, distribution)
+        percentiles.append(percentile)
+        luck = getLuckScore(percentile)
+        if luck == GOOD:
+            luckScores.append('GOOD')
+        elif luck == AVERAGE:
+            luckScores.append('AVERAGE')
+        else:
+            luckScores.append('BAD')
+
+        # CUT DOWN SOLUTION SPACE FOR NEXT GUESS
+        possibleIDs = getRemainingIDs(guessID, pattern, possibleIDs, length)
+        print(vocab.getWords(possibleIDs))
+
+    return {
+        'guesses': guesses,
+        'skills': skillScores,
+        'lucks': luckScores,
+        'percentiles': percentiles,
+        'bests': bests
+    }
+
 # --------- BOT --------- #
 
 description = 'Analyzes user guesses for the Discord Co-ordle bot'
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix='?', description=description, intents=intents)
+bot = makeBot(description)
 
 class EvalPages(discord.ui.View):
-    def __init__(self, guesses, skills, lucks, bests):
+    '''
+    Pages through a cached eval. The buttons are EvalPageButtons, whose custom IDs hold the
+    eval key and target page, so they keep working after a restart without recomputing
+    '''
+    def __init__(self, key, result, page=0):
         super().__init__(timeout=None)
-        self.guesses = guesses
-        self.skills = skills
-        self.lucks = lucks
-        self.bests = bests
-        self.current_page = 0
+        self.key = key
+        self.guesses = result['guesses']
+        self.skills = result['skills']
+        self.lucks = result['lucks']
+        self.percentiles = result['percentiles']
+        self.bests = result['bests']
+        self.current_page = page
+
+        last = len(self.guesses) - 1
+        self.add_item(EvalPageButton(key, 'prev', max(page - 1, 0), disabled=page == 0))
+        self.add_item(EvalPageButton(key, 'next', min(page + 1, last), disabled=page >= last))
 
     def update_embed(self):
         guess = self.guesses[self.current_page]
         skill = self.skills[self.current_page]
         luck = self.lucks[self.current_page]
+        percentile = self.percentiles[self.current_page]
         bestsByGuess = self.bests[self.current_page]
 
         expl = explanation(skill, luck)
@@ -405,31 +803,55 @@ class EvalPages(discord.ui.View):
 
         embed.description = (
         f"Skill: `{skill}`\n"
-        f"Luck: `{luck}`\n\n"
+        f"Luck: `{luck}` (better than `{percentile}%` of possible outcomes)\n\n"
         f"{expl}\n\n"
         f"**Some other good guesses were:**\n{bestGuessesList}"
         )
         return embed
 
-    @discord.ui.button(label="Previous", style=discord.ButtonStyle.gray, disabled=True)
-    async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.current_page -= 1
-        if self.current_page == 0:
-            self.previous_button.disabled = True
-        self.next_button.disabled = False
+class EvalPageButton(discord.ui.DynamicItem[discord.ui.Button],
+                     template=r'eval:(?P<direction>prev|next):(?P<key>\d+:[0-9a-f]+):(?P<page>\d+)'):
+    '''
+    Previous/Next button of EvalPages, resolved from its custom ID on click
+    (registered with bot.add_dynamic_items in setup_hook)
+    '''
+    def __init__(self, key, direction, page, disabled=False):
+        super().__init__(
+            discord.ui.Button(
+                label="Previous" if direction == 'prev' else "Next",
+                style=discord.ButtonStyle.gray,
+                custom_id=f'eval:{direction}:{key}:{page}',
+                disabled=disabled
+            )
+        )
+        self.key = key
+        self.direction = direction
+        self.page = page
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['key'], match['direction'], int(match['page']), item.disabled)
+
+    async def callback(self, interaction: discord.Interaction):
+        result = getCachedEval(self.key)
+        if result is None:
+            await interaction.response.send_message(
+                "This evaluation is no longer stored, call `?eval` on the Co-ordle again.", ephemeral=True
+            )
+            return
 
-        embed = self.update_embed()
-        await interaction.response.edit_message(embed=embed, view=self)
+        view = EvalPages(self.key, result, self.page)
+        embed = view.update_embed()
+        await interaction.response.edit_message(embed=embed, view=view)
 
-    @discord.ui.button(label="Next", style=discord.ButtonStyle.gray)
-    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.current_page += 1
-        if self.current_page == len(self.guesses) - 1:
-            self.next_button.disabled = True
-        self.previous_button.disabled = False
+@tasks.loop(minutes=5)
+async def evictPatternStores():
+    evictIdleStores()
 
-        embed = self.update_embed()
-        await interaction.response.edit_message(embed=embed, view=self)
+@bot.event
+async def setup_hook():
+    bot.add_dynamic_items(EvalPageButton)
+    evictPatternStores.start()
 
 @bot.event
 async def on_ready():
@@ -438,49 +860,17 @@ async def on_ready():
 
 @bot.command(name='eval')
 async def eval(ctx):
-    possibleSols = getWordlist(COMMON_WL)
-    guesslist = getWordlist(SCRABBLE_WORDLIST)
-    priors = getPriors(possibleSols)
-    patterns = getPatterns(guesslist, possibleSols)
-
-    guesses = []
-    skillScores = []
-    luckScores = []
-    bests = []
-
     # GET REFERENCED MESSAGE
     if ctx.message.reference is not None:
         referenced = await ctx.fetch_message(ctx.message.reference.message_id)
 
-        if isSolvedCoordle(referenced) is not None:
-            guesses = getGuesses(referenced)
-            solution = getSolution(referenced)
-
-            for guess in guesses:
-                pattern = getPattern(guess, solution)
-                expEntrs = expectedEntropies(guesslist, possibleSols, priors)
-                bestGuesses = getBestGuesses(guess, expEntrs, possibleSols, 5)
-                bests.append(bestGuesses)
-
-                print(bests)
-                print()
-
-                # skill score
-                skill = getSkillScore(guess, expEntrs, possibleSols)
-                skillScores.append(skill)
-
-                # luck score
-                luck = getLuckScore(guess, solution, expEntrs, possibleSols)
-                if luck == GOOD:
-                    luckScores.append('GOOD')
-                elif luck == AVERAGE:
-                    luckScores.append('AVERAGE')
-                else:
-                    luckScores.append('BAD')
-
-                # CUT DOWN SOLUTION SPACE FOR NEXT GUESS
-                possibleSols = getRemainingWords(guess, pattern, possibleSols)
-                print(possibleSols)
+        coordle = parseCoordle(referenced)
+        if coordle is not None:
+            key = getEvalKey(coordle.id, len(coordle.solution))
+            result = getCachedEval(key)
+            if result is None:
+                result = getEvaluation(coordle.guesses, coordle.solution)
+                cacheEval(key, result)
 
         else:
             await ctx.send("The referenced message must be a completed Co-ordle game.")
@@ -490,12 +880,18 @@ async def eval(ctx):
         return
 
     # OUTPUT
-    if guesses:
+    if result['guesses']:
         
-        view = EvalPages(guesses, skillScores, luckScores, bests)
+        view = EvalPages(key, result)
         embed = view.update_embed()
 
         await ctx.send(embed=embed, view=view)
     else:
         await ctx.send("No valid guesses to evaluate.")
-bot.run(TOKEN)
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['bundle']: # python eval.py bundle [length ...]
+        for length in [int(arg) for arg in sys.argv[2:]] or [LENGTH]:
+            saveBundle(length)
+            print(f"Saved {getBundleFile(length)}")
+    else:
+        bot.run(TOKEN)
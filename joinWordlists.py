@@ -1,9 +1,13 @@
 import os
+import heapq
+import itertools as it
+from store import loadJson, saveJson, transaction
 
 PROJECT_FOLDER = os.path.dirname(__file__)
 STORAGE_FOLDER = os.path.join(PROJECT_FOLDER, 'storage')
 WORDLIST_FOLDER = os.path.join(STORAGE_FOLDER, 'wordlists')
 COORDLE_WORDLIST = os.path.join(STORAGE_FOLDER, 'CoordleWordlist.txt')
+SOURCES_FILE = os.path.join(STORAGE_FOLDER, 'wordlistSources.json') # mtime/size of each joined file
 
 
 def getTotalWordlist(folder):
@@ -27,4 +31,102 @@ def saveTotalWordlist(directory, outputFile):
         for word in wordlist:
             file.write(word + '\n')
 
-saveTotalWordlist(WORDLIST_FOLDER, COORDLE_WORDLIST)
+def loadSources():
+    return loadJson(SOURCES_FILE)
+
+def saveSources(sources):
+    saveJson(SOURCES_FILE, sources)
+
+def getSources(folder):
+    # {filename: [mtime, size]} of every wordlist in folder
+    sources = {}
+    for filename in os.listdir(folder):
+        if filename.endswith('.txt'):
+            stat = os.stat(os.path.join(folder, filename))
+            sources[filename] = [stat.st_mtime_ns, stat.st_size]
+    return sources
+
+def readSorted(path, source):
+    '''
+    Streams the words of a sorted wordlist file as (word, source)
+
+    Raises ValueError if the file turns out not to be sorted
+    '''
+    previous = None
+    with open(path, 'r') as file:
+        for line in file:
+            word = line.strip()
+            if not word:
+                continue
+            if previous is not None and word < previous:
+                raise ValueError(f"{path} is not sorted")
+            previous = word
+            yield word, source
+
+def mergeWordlists(paths, outputFile):
+    '''
+    k-way merges sorted wordlists into outputFile, streaming (no file is loaded whole)
+
+    Parameters
+        paths: sorted wordlist files - the first is the current total wordlist
+        outputFile: file to write the merged wordlist to
+    Return
+        newWords: words that were not in the first file
+    '''
+    newWords = []
+    streams = [readSorted(path, source) for source, path in enumerate(paths)]
+    with open(outputFile, 'w+') as file:
+        for word, group in it.groupby(heapq.merge(*streams), key=lambda x: x[0]):
+            if next(group)[1] != 0: # lowest source first, so 0 if the total wordlist had it
+                newWords.append(word)
+            file.write(word + '\n')
+    return newWords
+
+def updateTotalWordlist(directory=WORDLIST_FOLDER, outputFile=COORDLE_WORDLIST):
+    '''
+    Updates the total wordlist with channel wordlists that changed since the last update.
+    Channel wordlists only ever gain words (see wordlist.updateWordlist), so merging the changed
+    ones into the current total wordlist is enough
+
+    Parameters
+        directory: folder of channel wordlists
+        outputFile: total wordlist file
+    Return
+        newWords: words added to the total wordlist, sorted (for incremental pattern grid updates)
+    '''
+    with transaction(): # channel wordlists are written by the bot (see store.py)
+        exists = os.path.exists(outputFile)
+        saved = loadSources() if exists else {} # without a total wordlist, every file counts as changed
+        sources = getSources(directory)
+        changed = [filename for filename, stat in sorted(sources.items()) if saved.get(filename) != stat]
+        if not changed and exists:
+            return []
+
+        paths = [outputFile if exists else os.devnull]
+        paths.extend(os.path.join(directory, filename) for filename in changed)
+
+        tempFile = f'{outputFile}.{os.getpid()}.tmp'
+        try:
+            newWords = mergeWordlists(paths, tempFile)
+        except ValueError:
+            # a channel wordlist that isn't sorted - fall back to rebuilding from scratch
+            old = set(getWordlist(outputFile))
+            saveTotalWordlist(directory, tempFile)
+            newWords = [word for word in getWordlist(tempFile) if word not in old]
+        os.replace(tempFile, outputFile)
+
+        saveSources(sources)
+    return newWords
+
+def getWordlist(path):
+    try:
+        with open(path, 'r') as file:
+            return [line.strip() for line in file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+if __name__ == '__main__':
+    newWords = updateTotalWordlist(WORDLIST_FOLDER, COORDLE_WORDLIST)
+    print(f"{len(newWords)} new word(s) added to {COORDLE_WORDLIST}")
+    for word in newWords:
+        print(word)
@@ -1,10 +1,10 @@
 import os
-import re
 import json
+import asyncio
 import discord
-from collections import Counter
-from discord.ext import commands
 from dotenv import load_dotenv
+from utils import isSolvedCoordle, isUnfinishedCoordle, parseCoordles, makeBot, getChannel
+from store import loadJson, saveJson, writeFile, transaction
 
 # --------- DIRECTORY --------- #
 # folder paths
@@ -14,15 +14,39 @@ MERCHANT_FOLDER = os.path.join(STORAGE_FOLDER, 'merchant')
 
 # file paths
 TS_FILE = os.path.join(MERCHANT_FOLDER, 'merchantTS.json')
+CHANNELS_FILE = os.path.join(MERCHANT_FOLDER, 'channels.json') # channel ID -> server stats it's part of
+UNFINISHED_FILE = os.path.join(MERCHANT_FOLDER, 'unfinished.json') # channel ID -> Co-ordles seen unfinished
 
 # Create folders if they don't exist
 os.makedirs(STORAGE_FOLDER, exist_ok=True)
 os.makedirs(MERCHANT_FOLDER, exist_ok=True)
 
 # --------- CONSTANTS --------- #
-EMBED_GREEN = '#78b159' # solved Co-ordle
-EMBED_RED = '#dd2e44' # unsolved Co-ordle
-COORDLE = 1071892566158614608
+DISCORD_EPOCH = 1420070400000 # ms, start of message ID timestamps
+DAY_MS = 24 * 60 * 60 * 1000
+UNFINISHED_DAYS = 7 # unfinished Co-ordles this much older than the timestamp are no longer tracked
+WINDOWS = {'week': 7, 'month': 30, 'all': None} # ?merchants periods, in days (None = lifetime)
+SCOPES = ('server', 'channel', 'global') # ?merchants scopes, default first
+SUMMARY_CHECKPOINT = 1000 # new games in a game log before its summary is rewritten
+
+# per-user stats (see loadSummary), one column each
+USER_COLUMNS = ('games', 'guesses', 'solves', 'contribution', 'firstGuessHits', 'streak', 'bestStreak', 'lastGame')
+# ?stats metrics: name -> (title, unit, value of column i, whether higher is better)
+METRICS = {
+    'hits': ('First-Guess Hit Rate', '%', lambda s, i: s['firstGuessHits'][i] / s['games'][i] * 100, True),
+    'guesses': ('Guesses per Game', '', lambda s, i: s['guesses'][i] / s['games'][i], False),
+    'solves': ('Solve Rate', '%', lambda s, i: s['solves'][i] / s['games'][i] * 100, True),
+    'contribution': ('Solve Contribution', '%', lambda s, i: s['contribution'][i] / s['games'][i] * 100, True),
+    'streak': ('Current Solved Streak', '', lambda s, i: s['streak'][i], True),
+    'best': ('Best Solved Streak', '', lambda s, i: s['bestStreak'][i], True),
+    'games': ('Co-ordles Played', '', lambda s, i: s['games'][i], True)
+}
+LEADERBOARD_SIZE = 10 # users listed by ?merchants and ?stats (embed descriptions are capped at 4096 characters)
+
+# channels caught up since startup - after that, Co-ordles are ingested as they are posted
+LIVE_CHANNELS = set()
+SUMMARIES = {} # stats name -> [summary file stat, summary, games since its checkpoint], see getSummary
+SYNC_LOCKS = {}
 
 # load token
 load_dotenv()
@@ -30,68 +54,21 @@ TOKEN = os.getenv('TOKEN')
 
 # --------- BOT SETUP --------- #
 description = 'Analyzes user guesses for the Discord Co-ordle bot'
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix='?', description=description, intents=intents)
+bot = makeBot(description)
 
 # --------- FUNCTIONS --------- #
 # NEW WORDS RETRIEVED
-def isSolvedCoordle(message):
-    '''
-    Determines if a message is a Co-ordle and whether it is solved or unsolved
-    
-    Parameter
-        message: Discord message
-    Returns
-        True: is Co-ordle, solved
-        False: is Co-ordle, unsolved
-        None: not a Co-ordle
-    '''
-    if message.author.id == COORDLE and message.embeds:
-        embed = message.embeds[0]
-        if str(embed.color) == EMBED_GREEN:
-            return True
-        elif str(embed.color) == EMBED_RED:
-            return False
-    return None
-
 async def getCoordles(channel, timestamp):
+    # finished Co-ordles since timestamp, and message IDs of the unfinished ones
     coordles = []
+    unfinished = []
     async for message in channel.history(after=discord.Object(id=timestamp), limit = None):
         if isSolvedCoordle(message) is not None:
             coordles.append(message)
-    return coordles
-
-
-def getSolvedCoordles(coordles):
-    solved = [coordle for coordle in coordles if isSolvedCoordle(coordle)]
-    return solved
-
-def loadJson(path):
-    '''
-    Loads JSON file
-
-    Parameter
-        path: JSON file path
-    Return
-        Loaded JSON data (empty dictionary if file not found or empty)
-    '''
-    try:
-        with open(path, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-def saveJson(path, data):
-    '''
-    Saves JSON file
+        elif isUnfinishedCoordle(message):
+            unfinished.append(message.id)
+    return coordles, unfinished
 
-    Parameter
-        path: JSON file path
-        data: data to save
-    '''
-    with open(path, 'w+') as f:
-        json.dump(data, f, indent=4)
 
 def getTimestamp(channel):
     '''
@@ -112,69 +89,318 @@ def updateTimestamp(channel, coordles):
 
     Parameters
         channel: Discord channel
-        coordles: list of coordles
+        coordles: list of Coordle records (see parseCoordle)
     '''
     if coordles:
-        newest = coordles[-1].id  # message ID of most recent Co-ordle
+        newest = max(coordle.id for coordle in coordles)  # message ID of most recent Co-ordle
         channelID = channel.id
         retrievals = loadJson(TS_FILE)
-        retrievals[str(channelID)] = newest
+        retrievals[str(channelID)] = max(newest, retrievals.get(str(channelID), 0))
         saveJson(TS_FILE, retrievals)
     else:
         print('No new Co-ordles retrieved')
 
-def getMerchant(coordle):
-    embed = coordle.embeds[0]
-    guesses = embed.description or ''
-    guessers = re.findall(r'<@!(\d+)>', guesses)
-    guesserIDs = list(map(int, guessers))
-    
-    possibleMerchant = guesserIDs[-1] # first guess = answer
-
-    if possibleMerchant in guesserIDs[:-1]:
-        return None  # not a merchant, made guesses earlier
-    
-    return possibleMerchant
-
-def updateStats(saved, gamesPlayed, merchantings):
-    for user in set(gamesPlayed.keys()).union(merchantings.keys()):
-        if str(user) not in saved:
-            saved[str(user)] = {'gamesPlayed': 0, 'merchantings': 0}
-        
-        saved[str(user)]['gamesPlayed'] += gamesPlayed.get(user, 0)
-        saved[str(user)]['merchantings'] += merchantings.get(user, 0)
-    
-    return saved
-
-def loadStatsFile(channel):
-    channelID = channel.id
-    path = os.path.join(MERCHANT_FOLDER, f'{channelID}.json')
+def addUnfinished(channel, messageIDs):
+    '''
+    Records Co-ordles seen before they finished, so they are still ingested when an edit finishes
+    them after the channel's timestamp has already moved past them (see getNewCoordles)
+
+    Parameters
+        channel: Discord channel
+        messageIDs: message IDs of unfinished Co-ordles
+    '''
+    if messageIDs:
+        channelID = str(channel.id)
+        with transaction():
+            unfinished = loadJson(UNFINISHED_FILE)
+            unfinished[channelID] = sorted(set(unfinished.get(channelID, [])).union(messageIDs))
+            saveJson(UNFINISHED_FILE, unfinished)
+
+def getNewCoordles(channel, coordles):
+    '''
+    Picks out the Co-ordles not ingested yet - those past the channel's timestamp, and older ones
+    only if they were recorded as unfinished (addUnfinished) - so a finished Co-ordle that is
+    edited again is not ingested twice. The picked Co-ordles, and unfinished ones more than
+    UNFINISHED_DAYS older than the timestamp, are no longer tracked as unfinished
+
+    Parameters
+        channel: Discord channel
+        coordles: list of Coordle records (see parseCoordle)
+    Return
+        list of the Coordle records not ingested yet
+    '''
+    timestamp = getTimestamp(channel)
+    channelID = str(channel.id)
+    unfinished = loadJson(UNFINISHED_FILE)
+    pending = set(unfinished.get(channelID, []))
+    coordles = [coordle for coordle in coordles if coordle.id > timestamp or coordle.id in pending]
+
+    cutoff = timestamp - (UNFINISHED_DAYS * DAY_MS << 22)
+    remaining = pending.difference(coordle.id for coordle in coordles)
+    remaining = sorted(messageID for messageID in remaining if messageID > cutoff)
+    if len(remaining) != len(pending):
+        if remaining:
+            unfinished[channelID] = remaining
+        else:
+            del unfinished[channelID]
+        saveJson(UNFINISHED_FILE, unfinished)
+    return coordles
+
+def getScopes(channel):
+    '''
+    Gets the names of the stats a channel's Co-ordles count towards - the channel's own, its
+    server's and the global ones (across every server)
+
+    Parameter
+        channel: Discord channel
+    Return
+        dict of scope -> stats name (no 'server' outside of servers)
+    '''
+    scopes = {'channel': str(channel.id), 'global': 'global'}
+    if getattr(channel, 'guild', None) is not None:
+        scopes['server'] = f'guild_{channel.guild.id}'
+    return scopes
+
+def loadStatsFile(name):
+    # lifetime stats kept before game logs (name: stats name from getScopes), see loadSummary
+    path = os.path.join(MERCHANT_FOLDER, f'{name}.json')
     file = loadJson(path)
     return file
 
-def saveStatsFile(channel, stats):
-    channelID = channel.id
-    path = os.path.join(MERCHANT_FOLDER, f'{channelID}.json')
-    saveJson(path, stats)
-
-def getGamesPlayed(coordles):
-    gamesPlayed = Counter()
-    for coordle in coordles:
-        embed = coordle.embeds[0] 
-        description = embed.description or ''
-        
-        participants = set(re.findall(r'<@!(\d+)>', description))
-        
-        for participant in participants:
-            gamesPlayed[participant] += 1
-    return gamesPlayed
-
-def getMerchantings(coordles):
-    solvedCoordles = getSolvedCoordles(coordles)
-    merchants = [getMerchant(coordle) for coordle in solvedCoordles]
-    merchants = [merc for merc in merchants if merc is not None]
-    merchantings = Counter(merchants)
-    return merchantings
+def getDay(messageID):
+    # day number (days since the Unix epoch, UTC) encoded in a message ID
+    return ((messageID >> 22) + DISCORD_EPOCH) // DAY_MS
+
+def getGameRecord(coordle):
+    '''
+    Reduces a Co-ordle to the compact record kept in the game logs (see appendGames)
+
+    Parameter
+        coordle: Coordle record from parseCoordles
+    Return
+        [message ID, winner, rows], None if no row has a guesser
+            winner: user ID of the last guesser of a solved Co-ordle (None if unsolved)
+            rows: [user ID, guesses, first guess was the answer] per guesser, in order of first guess
+    '''
+    rows = {}
+    last = None
+    for guess, user in zip(coordle.guesses, coordle.guessers):
+        if user is None:
+            continue
+        if user not in rows:
+            rows[user] = [user, 0, guess == coordle.solution]
+        rows[user][1] += 1
+        last = user
+    if last is None:
+        return None
+    return [coordle.id, last if coordle.solved else None, list(rows.values())]
+
+def getLogFile(name):
+    # append-only game log of a stats name from getScopes, one JSON record per line
+    return os.path.join(MERCHANT_FOLDER, f'{name}_games.jsonl')
+
+def appendGames(name, records):
+    # appends game records (from getGameRecord) to a game log - O(records), whatever the history
+    if not records:
+        return
+    with open(getLogFile(name), 'a') as f:
+        f.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+
+def readGames(name, offset):
+    '''
+    Reads the records appended to a game log since offset
+
+    Parameters
+        name: stats name from getScopes
+        offset: byte offset already read
+    Return
+        records, new offset (only whole lines are read)
+    '''
+    try:
+        with open(getLogFile(name), 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], offset
+    data = data[:data.rfind(b'\n') + 1]
+    return [json.loads(line) for line in data.splitlines()], offset + len(data)
+
+def getSummaryFile(name):
+    return os.path.join(MERCHANT_FOLDER, f'{name}_summary.json')
+
+def getFileStat(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def loadSummary(name):
+    '''
+    Loads the summary of a game log (name from getScopes), checkpointed up to offset:
+        offset: byte offset of the game log the summary covers
+        stats: user ID -> {'gamesPlayed', 'merchantings'}, lifetime (starting from the stats
+               file kept before game logs, if any)
+        daily: day number -> user ID -> [Co-ordles played, merchantings] that day (sparse)
+        users: per-user stats, column-wise - users holds the user IDs and each of USER_COLUMNS
+               one value per user, in the same order
+            games: Co-ordles played
+            guesses: rows guessed
+            solves: Co-ordles the user made the winning guess in
+            contribution: sum over solved Co-ordles of the user's share of their guesses
+            firstGuessHits: Co-ordles where the user's first guess was the answer (i.e. merchantings)
+            streak / bestStreak: current / longest run of played Co-ordles that were solved, in
+                                 the order they were logged (oldest first within a batch)
+            lastGame: message ID of the user's latest Co-ordle
+    '''
+    return loadJson(getSummaryFile(name)) or {
+        'offset': 0,
+        'stats': loadStatsFile(name),
+        'daily': {},
+        'users': {'users': [], **{column: [] for column in USER_COLUMNS}}
+    }
+
+def saveSummary(name, summary):
+    path = getSummaryFile(name)
+    writeFile(path, json.dumps(summary, separators=(',', ':')))
+    SUMMARIES[name] = [getFileStat(path), summary, 0]
+
+def getUserColumn(userStats, columns, user):
+    # index of user in userStats (columns: user ID -> index), adding the user if new
+    if user not in columns:
+        columns[user] = len(userStats['users'])
+        userStats['users'].append(user)
+        for column in USER_COLUMNS:
+            userStats[column].append(0)
+    return columns[user]
+
+def addGame(summary, columns, record):
+    '''
+    Adds one game record to a summary, in O(guessers)
+
+    Parameters
+        summary: summary from loadSummary
+        columns: user ID -> index in summary['users']
+        record: game record from getGameRecord
+    '''
+    messageID, winner, rows = record
+    day = summary['daily'].setdefault(str(getDay(messageID)), {})
+    userStats = summary['users']
+    total = sum(guesses for user, guesses, firstHit in rows)
+    for user, guesses, firstHit in rows:
+        merchant = user == winner and guesses == 1 # the winning guess was their only one
+
+        counts = day.setdefault(user, [0, 0])
+        counts[0] += 1
+        counts[1] += merchant
+        lifetime = summary['stats'].setdefault(user, {'gamesPlayed': 0, 'merchantings': 0})
+        lifetime['gamesPlayed'] += 1
+        lifetime['merchantings'] += merchant
+
+        i = getUserColumn(userStats, columns, user)
+        userStats['games'][i] += 1
+        userStats['guesses'][i] += guesses
+        if winner is not None:
+            userStats['contribution'][i] += guesses / total
+        userStats['solves'][i] += user == winner
+        userStats['firstGuessHits'][i] += firstHit
+        userStats['streak'][i] = userStats['streak'][i] + 1 if winner is not None else 0
+        userStats['bestStreak'][i] = max(userStats['bestStreak'][i], userStats['streak'][i])
+        userStats['lastGame'][i] = max(userStats['lastGame'][i], messageID)
+
+def mergeUserStats(userStats, other):
+    # adds the per-user stats in other to userStats - counts add up, streaks carry over from
+    # whichever has the later last game
+    columns = {user: i for i, user in enumerate(userStats['users'])}
+    for j, user in enumerate(other['users']):
+        i = getUserColumn(userStats, columns, user)
+        for column in ('games', 'guesses', 'solves', 'contribution', 'firstGuessHits'):
+            userStats[column][i] += other[column][j]
+        userStats['bestStreak'][i] = max(userStats['bestStreak'][i], other['bestStreak'][j])
+        if other['lastGame'][j] > userStats['lastGame'][i]:
+            userStats['streak'][i] = other['streak'][j]
+            userStats['lastGame'][i] = other['lastGame'][j]
+    return userStats
+
+def mergeSummary(summary, other):
+    # adds the games counted in other to summary
+    for user, counts in other['stats'].items():
+        lifetime = summary['stats'].setdefault(user, {'gamesPlayed': 0, 'merchantings': 0})
+        lifetime['gamesPlayed'] += counts['gamesPlayed']
+        lifetime['merchantings'] += counts['merchantings']
+    for day, users in other['daily'].items():
+        target = summary['daily'].setdefault(day, {})
+        for user, (games, merchantings) in users.items():
+            counts = target.setdefault(user, [0, 0])
+            counts[0] += games
+            counts[1] += merchantings
+    mergeUserStats(summary['users'], other['users'])
+    return summary
+
+def getSummary(name):
+    '''
+    Gets the summary of a game log, adding the games appended since it was last read. Summaries
+    stay in memory (reloaded only when another process rewrote the file), so a query only reads
+    the new games, and the checkpoint on disk is only rewritten once SUMMARY_CHECKPOINT games
+    have piled up
+
+    Parameter
+        name: stats name from getScopes
+    Return
+        summary covering the whole game log
+    '''
+    with transaction():
+        stat = getFileStat(getSummaryFile(name))
+        cached = SUMMARIES.get(name)
+        if cached is None or cached[0] != stat:
+            cached = SUMMARIES[name] = [stat, loadSummary(name), 0]
+        summary = cached[1]
+
+        records, summary['offset'] = readGames(name, summary['offset'])
+        if records:
+            columns = {user: i for i, user in enumerate(summary['users']['users'])}
+            for record in records:
+                addGame(summary, columns, record)
+        cached[2] += len(records)
+        if cached[2] >= SUMMARY_CHECKPOINT:
+            saveSummary(name, summary)
+    return summary
+
+def getWindowStats(daily, today, numDays):
+    '''
+    Gets per-user stats over the last numDays days (including today)
+
+    Parameters
+        daily: daily counts of a summary from getSummary
+        today: day number of today
+        numDays: length of the window
+    Return
+        stats in the same shape as a summary's stats (users without games in the window left out)
+    '''
+    stats = {}
+    for day in range(today - numDays + 1, today + 1):
+        for user, (games, merchantings) in daily.get(str(day), {}).items():
+            totals = stats.setdefault(user, {'gamesPlayed': 0, 'merchantings': 0})
+            totals['gamesPlayed'] += games
+            totals['merchantings'] += merchantings
+    return stats
+
+def getRankings(userStats, metric):
+    '''
+    Ranks users by a metric of their per-user stats
+
+    Parameters
+        userStats: per-user stats of a summary from getSummary
+        metric: key of METRICS
+    Return
+        list of (user ID, value), best first (highest or lowest, depending on the metric)
+    '''
+    title, unit, value, higherIsBetter = METRICS[metric]
+    rankings = [
+        (user, value(userStats, i)) for i, user in enumerate(userStats['users'])
+        if userStats['games'][i] > 0
+    ]
+    return sorted(rankings, key=lambda x: x[1], reverse=higherIsBetter)
 
 def getMercPercs(allStats):
     mercPercs = {}
@@ -192,27 +418,130 @@ def getMercPercs(allStats):
     )
     return sortedMercPercs
 
+def registerChannel(channel):
+    '''
+    The first time a channel is seen, adds the stats it already has to its server's and the
+    global stats, which from then on are updated alongside the channel's on every ingest
+
+    Parameter
+        channel: Discord channel
+    '''
+    with transaction():
+        registered = loadJson(CHANNELS_FILE)
+        if str(channel.id) in registered:
+            return
+
+        scopes = getScopes(channel)
+        summary = getSummary(scopes['channel'])
+        if summary['stats']:
+            for scope, name in scopes.items():
+                if scope != 'channel':
+                    saveSummary(name, mergeSummary(getSummary(name), summary))
+
+        registered[str(channel.id)] = scopes.get('server')
+        saveJson(CHANNELS_FILE, registered)
+
+def ingestCoordles(channel, coordles):
+    '''
+    Adds Co-ordles to the game logs of the channel, its server and the global stats (one appended
+    line per Co-ordle each - summaries catch up when queried), and moves the channel's timestamp
+    past them
+
+    Parameters
+        channel: Discord channel
+        coordles: list of Co-ordles (discord.Message or raw message payloads)
+    '''
+    coordles = parseCoordles(coordles)
+    with transaction():
+        coordles = getNewCoordles(channel, coordles)
+        records = sorted(
+            (record for record in map(getGameRecord, coordles) if record is not None),
+            key=lambda record: record[0]
+        )
+        updateTimestamp(channel, coordles)
+        for name in getScopes(channel).values():
+            appendGames(name, records)
+
+async def syncChannel(channel):
+    '''
+    Catches up on Co-ordles posted since the channel's timestamp (i.e. while the bot was down),
+    once per channel per startup - after that, the listeners keep the channel up to date
+
+    Parameter
+        channel: Discord channel
+    '''
+    async with SYNC_LOCKS.setdefault(channel.id, asyncio.Lock()):
+        if channel.id not in LIVE_CHANNELS:
+            registerChannel(channel)
+            coordles, unfinished = await getCoordles(channel, getTimestamp(channel))
+            with transaction():
+                addUnfinished(channel, unfinished)
+                ingestCoordles(channel, coordles)
+            LIVE_CHANNELS.add(channel.id)
+
+def getLeaderboardTitle(ctx, scope, period, heading='Biggest Merchants'):
+    if scope == 'global':
+        title = f'{heading} Everywhere'
+    elif scope == 'channel' or ctx.guild is None:
+        title = f'{heading} in `#{ctx.channel.name}`'
+    else:
+        title = f'{heading} in `{ctx.guild.name}`'
+    if period != 'all':
+        title += f' this {period}'
+    return title
+
 # --------- EXECUTION --------- #
 @bot.event
 async def on_ready():
     print(f'Logged in as {bot.user} (ID: {bot.user.id})')
     print('---------')
 
-@bot.command(name='merchants')
-async def merchants(ctx):
-    channel = ctx.channel
-    timestamp = getTimestamp(channel)
-    coordles = await getCoordles(channel, timestamp)
-    updateTimestamp(channel, coordles)
+@bot.listen('on_message')
+async def on_message(message):
+    if isUnfinishedCoordle(message): # ingested once an edit finishes it
+        addUnfinished(message.channel, [message.id])
+        return
+    if isSolvedCoordle(message) is None:
+        return
+    await syncChannel(message.channel)
+    if message.id > getTimestamp(message.channel): # not already picked up by the catch-up
+        ingestCoordles(message.channel, [message])
+
+@bot.listen('on_raw_message_edit')
+async def on_raw_message_edit(payload):
+    # a Co-ordle that just finished (was not a finished Co-ordle before the edit - if the message
+    # is not cached, getNewCoordles tells whether it was already ingested)
+    before = payload.cached_message
+    if isSolvedCoordle(payload.data) is None or (before is not None and isSolvedCoordle(before) is not None):
+        return
+    channel = await getChannel(bot, payload.channel_id)
+    await syncChannel(channel)
+    ingestCoordles(channel, [payload.data])
 
-    # GAMES PLAYED
-    gamesPlayed = getGamesPlayed(coordles)
+@bot.command(name='merchants')
+async def merchants(ctx, *args):
+    # ?merchants [week|month|all] [server|channel|global], in any order
+    period, scope = 'all', SCOPES[0]
+    for arg in args:
+        if arg.lower() in WINDOWS:
+            period = arg.lower()
+        elif arg.lower() in SCOPES:
+            scope = arg.lower()
+        else:
+            await ctx.send(
+                f"Usage: `?merchants [{'|'.join(WINDOWS)}] [{'|'.join(SCOPES)}]`"
+            )
+            return
 
-    # GAMES MERCHANTED
-    merchantings = getMerchantings(coordles)
-    savedStats = loadStatsFile(channel)
-    updatedStats = updateStats(savedStats, gamesPlayed, merchantings)
-    mercPercs = getMercPercs(updatedStats)
+    channel = ctx.channel
+    await syncChannel(channel)
+    scopes = getScopes(channel)
+    name = scopes.get(scope, scopes['channel'])
+    if WINDOWS[period] is None:
+        updatedStats = getSummary(name)['stats']
+    else:
+        updatedStats = getWindowStats(getSummary(name)['daily'], getDay(ctx.message.id), WINDOWS[period])
+    mercPercs = getMercPercs(updatedStats)[:LEADERBOARD_SIZE]
 
     # OUTPUT
     rankings = '\n'.join(
@@ -221,7 +550,7 @@ async def merchants(ctx):
     )
 
     embed = discord.Embed(
-        title=f'Biggest Merchants in `{ctx.guild.name}`',
+        title=getLeaderboardTitle(ctx, scope, period),
         description=(
             'Times merchanted / Co-ordles played\n\n' + rankings
         ),
@@ -229,7 +558,37 @@ async def merchants(ctx):
     )
     await ctx.send(embed=embed)
 
-    # SAVE STATS
-    saveStatsFile(channel, updatedStats)
+@bot.command(name='stats')
+async def stats(ctx, *args):
+    # ?stats [hits|guesses|solves|contribution|streak|best|games] [server|channel|global], in any order
+    metric, scope = next(iter(METRICS)), SCOPES[0]
+    for arg in args:
+        if arg.lower() in METRICS:
+            metric = arg.lower()
+        elif arg.lower() in SCOPES:
+            scope = arg.lower()
+        else:
+            await ctx.send(
+                f"Usage: `?stats [{'|'.join(METRICS)}] [{'|'.join(SCOPES)}]`"
+            )
+            return
+
+    channel = ctx.channel
+    await syncChannel(channel)
+    scopes = getScopes(channel)
+    userStats = getSummary(scopes.get(scope, scopes['channel']))['users']
+    rankings = getRankings(userStats, metric)[:LEADERBOARD_SIZE]
+
+    # OUTPUT
+    heading, unit, value, higherIsBetter = METRICS[metric]
+    embed = discord.Embed(
+        title=getLeaderboardTitle(ctx, scope, 'all', heading),
+        description='\n'.join(
+            f"{i+1}. <@!{user}>: `{round(score, 2):g}{unit}`" for i, (user, score) in enumerate(rankings)
+        ),
+        color=discord.Color.purple()
+    )
+    await ctx.send(embed=embed)
 
-bot.run(TOKEN)
\ No newline at end of file
+if __name__ == '__main__':
+    bot.run(TOKEN)
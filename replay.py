@@ -0,0 +1,399 @@
+'''
+replay.py
+
+--- FUNCTION ---
+Offline replay and load test for the bot commands, without a Discord connection.
+Co-ordles are built as stand-in messages (real discord.Embed objects, with the same description
+rows, guesser mentions and solution field that utils.parseCoordle reads), put into stand-in
+channels, and the commands are driven through a stand-in ctx.
+
+Games come from either
+    - a recorded file: JSON list of raw Discord message payloads
+      ({"id", "channel_id", "guild_id", "author": {"id"}, "embeds": [embed dict]})
+    - synthetic games: random guesses from the Scrabble wordlist (or random letters if there is no
+      wordlist in storage), guessed by a random set of users
+
+All storage is redirected to a temporary folder (the Common/Scrabble wordlists and pattern grid are
+copied over for ?eval), so replays never touch the bot's real state.
+
+--- USAGE ---
+python replay.py merchants --games 2000 --channels 4 --requests 200 --concurrency 8
+python replay.py ingest --games 5000 --record recorded.json
+python replay.py ingest --replay recorded.json
+python replay.py eval --games 20 --requests 20
+python replay.py entropies
+
+    ingest: feeds every game through the on_message listeners (wordlist + merchant)
+    wordlist / merchants / stats / eval: runs the command --requests times, at most --concurrency at once
+    (?eval is called as a reply to a random game)
+    entropies: checks that eval.getEntropies' peak memory stays bounded with only 1-2 possible
+    solutions left (exits with an error if not) - on the wordlists in storage, or random words
+
+Reports latency percentiles (ms) and throughput (requests/s).
+'''
+
+import os
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import statistics
+import importlib
+import tracemalloc
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import discord
+import numpy as np
+
+# --------- CONSTANTS --------- #
+PROJECT_FOLDER = os.path.dirname(__file__)
+STORAGE_FOLDER = os.path.join(PROJECT_FOLDER, 'storage')
+EVAL_FILES = ('Common6.txt', 'ScrabbleWordlist.txt', 'patterns.npy')
+
+COORDLE = 1071892566158614608
+EMBED_GREEN = 0x78b159 # solved Co-ordle
+EMBED_RED = 0xdd2e44 # unsolved Co-ordle
+MAX_GUESSES = 8
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+COMMAND_MODULES = {'wordlist': 'wordlist', 'merchants': 'merchant', 'stats': 'merchant', 'eval': 'eval'}
+
+# --------- STAND-INS --------- #
+class FakeMessage:
+    def __init__(self, id, channel, authorID, embeds, reference=None):
+        self.id = id
+        self.channel = channel
+        self.author = SimpleNamespace(id=authorID)
+        self.embeds = embeds
+        self.reference = reference
+        self.created_at = discord.utils.snowflake_time(id)
+
+class FakeChannel:
+    def __init__(self, id, guild=None, messages=None):
+        self.id = id
+        self.name = f'replay-{id}'
+        self.guild = guild
+        self.messages = messages or []
+
+    def history(self, after=None, limit=None):
+        # oldest first, like channel.history(after=...)
+        afterID = after.id if after is not None else 0
+        messages = [message for message in self.messages if message.id > afterID][:limit]
+
+        async def iterate():
+            for message in messages:
+                yield message
+        return iterate()
+
+class FakeContext:
+    def __init__(self, channel, message):
+        self.channel = channel
+        self.message = message
+        self.guild = channel.guild
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append((content, kwargs))
+
+    async def fetch_message(self, id):
+        for message in self.channel.messages:
+            if message.id == id:
+                return message
+        raise discord.NotFound(SimpleNamespace(status=404, reason='Not Found'), 'Unknown Message')
+
+# --------- GAMES --------- #
+def makeSnowflake(index):
+    # message IDs increasing with index, timestamped from now
+    ms = int(datetime.now(timezone.utc).timestamp() * 1000) - discord.utils.DISCORD_EPOCH
+    return ((ms + index) << 22) + index % (1 << 22)
+
+def rowToEmotes(guess, userID):
+    return ''.join(f':green_{letter.lower()}:' for letter in guess) + f' <@!{userID}>'
+
+def makeGamePayload(id, channelID, guildID, guesses, guessers, solution):
+    '''
+    Builds the raw payload of a finished Co-ordle
+
+    Parameters
+        id: message ID
+        channelID: channel ID
+        guildID: server ID
+        guesses: list of guesses (solved if the last one is the solution)
+        guessers: user ID for each guess
+        solution: solution
+    Return
+        payload: dict in the shape of a Discord message
+    '''
+    solved = guesses[-1] == solution
+    embed = {
+        'title': 'Co-ordle',
+        'description': '\n'.join(rowToEmotes(guess, user) for guess, user in zip(guesses, guessers)),
+        'color': EMBED_GREEN if solved else EMBED_RED,
+        'fields': []
+    }
+    if not solved:
+        embed['fields'] = [
+            {'name': 'Solution', 'value': f'`{solution}`', 'inline': False},
+            {'name': 'Players', 'value': ' '.join(f'<@!{user}>' for user in set(guessers)), 'inline': False}
+        ]
+    return {
+        'id': id, 'channel_id': channelID, 'guild_id': guildID, 'author': {'id': COORDLE}, 'embeds': [embed]
+    }
+
+def makeSyntheticGames(numGames, channelIDs, guildIDs, words, solutions, numUsers, seed):
+    # channel i is in server i % len(guildIDs)
+    rng = random.Random(seed)
+    users = [rng.randrange(10**17, 10**18) for x in range(numUsers)]
+    payloads = []
+    for i in range(numGames):
+        solution = rng.choice(solutions)
+        numGuesses = rng.randint(1, MAX_GUESSES)
+        guesses = [rng.choice(words) for x in range(numGuesses - 1)]
+        if rng.random() < 0.9: # most Co-ordles get solved
+            guesses.append(solution)
+        elif not guesses:
+            guesses.append(rng.choice(words))
+        guessers = [rng.choice(users) for guess in guesses]
+        channel = rng.randrange(len(channelIDs))
+        payloads.append(makeGamePayload(
+            makeSnowflake(i), channelIDs[channel], guildIDs[channel % len(guildIDs)], guesses, guessers, solution
+        ))
+    return payloads
+
+def loadGames(payloads):
+    '''
+    Builds stand-in channels and messages from raw message payloads
+
+    Parameter
+        payloads: list of raw message payloads
+    Return
+        channels: dict of channel ID -> FakeChannel (messages sorted oldest first)
+    '''
+    channels = {}
+    guilds = {}
+    for payload in sorted(payloads, key=lambda p: int(p['id'])):
+        channelID = int(payload['channel_id'])
+        if channelID not in channels:
+            guildID = payload.get('guild_id')
+            guild = None
+            if guildID is not None:
+                guild = guilds.setdefault(int(guildID), SimpleNamespace(id=int(guildID), name=f'Replay {guildID}'))
+            channels[channelID] = FakeChannel(channelID, guild)
+        channel = channels[channelID]
+        embeds = [discord.Embed.from_dict(embed) for embed in payload.get('embeds', [])]
+        channel.messages.append(
+            FakeMessage(int(payload['id']), channel, int(payload['author']['id']), embeds)
+        )
+    return channels
+
+# --------- MODULES --------- #
+def useStorage(module, storageFolder):
+    # points every storage path of a bot module at storageFolder
+    original = module.STORAGE_FOLDER
+    for name, value in list(vars(module).items()):
+        if isinstance(value, str) and name.isupper() and value.startswith(original):
+            setattr(module, name, storageFolder + value[len(original):])
+
+def loadModule(name, storageFolder):
+    module = importlib.import_module(name)
+    useStorage(module, storageFolder)
+    useStorage(importlib.import_module('store'), storageFolder) # store lock
+    for name, value in vars(module).items():
+        if name.endswith('_FOLDER') and isinstance(value, str):
+            os.makedirs(value, exist_ok=True)
+    return module
+
+def readWords(filename):
+    path = os.path.join(STORAGE_FOLDER, filename)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+def getReplayWords():
+    '''
+    Gets words for synthetic games - the Scrabble (guesses) and Common (solutions) wordlists if
+    they are in storage, as ?eval needs, otherwise random letters
+
+    Return
+        guessWords, solutionWords
+    '''
+    guessWords = readWords('ScrabbleWordlist.txt')
+    solutionWords = readWords('Common6.txt')
+    if not guessWords:
+        rng = random.Random(0)
+        guessWords = [''.join(rng.choice(LETTERS) for x in range(6)) for y in range(2000)]
+    return guessWords, solutionWords or guessWords
+
+# --------- LOAD TEST --------- #
+async def runRequests(handler, numRequests, concurrency):
+    '''
+    Runs handler(i) for i in range(numRequests), at most concurrency at once
+
+    Return
+        latencies: seconds per request
+        elapsed: total seconds
+    '''
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(i) for i in range(numRequests)))
+    return latencies, time.perf_counter() - start
+
+def getReport(name, latencies, elapsed):
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        p50, p90, p99 = cuts[49], cuts[89], cuts[98]
+    else:
+        p50 = p90 = p99 = latencies[0] if latencies else 0
+    return {
+        'command': name,
+        'requests': len(latencies),
+        'p50_ms': round(p50 * 1000, 3),
+        'p90_ms': round(p90 * 1000, 3),
+        'p99_ms': round(p99 * 1000, 3),
+        'max_ms': round(max(latencies, default=0) * 1000, 3),
+        'throughput': round(len(latencies) / elapsed, 1) if elapsed else 0
+    }
+
+def getEntropyMemoryReport(storageFolder):
+    '''
+    Measures the peak memory (tracemalloc) of eval.getEntropies over the whole vocabulary, for all,
+    50, 2 and 1 possible solutions, with a single worker. Tiles are sized to ENTROPY_TILE_BYTES
+    whatever the number of possible solutions, so the peak should stay within a few tiles
+
+    Parameter
+        storageFolder: storage folder, with the eval files (built from random words if missing)
+    Return
+        report: peak MB by number of possible solutions, the bound and whether it was kept
+    '''
+    evalModule = loadModule('eval', storageFolder)
+    evalModule.ENTROPY_WORKERS = 1 # before the pool starts - one tile in flight at a time
+    if not os.path.exists(evalModule.PATTERNS_FILE):
+        words, solutions = getReplayWords()
+        for path, wordlist in ((evalModule.SCRABBLE_WORDLIST, words), (evalModule.COMMON_WL, solutions)):
+            with open(path, 'w+') as f:
+                f.write('\n'.join(wordlist))
+        evalModule.savePatterns()
+
+    store = evalModule.getPatternStore()
+    guessIDs = np.arange(len(store['vocab']))
+    solutionIDs, priors = store['bundle']['solutionIDs'], store['bundle']['priors']
+    # a tile's patterns, counts and float32 temporaries, plus the entropies of every guess
+    bound = 4 * evalModule.ENTROPY_TILE_BYTES + 8 * len(guessIDs)
+
+    peaks = {}
+    for numSolutions in (len(solutionIDs), 50, 2, 1):
+        possibleIDs = solutionIDs[:numSolutions]
+        weights = evalModule.getWeights(possibleIDs, priors)
+        tracemalloc.start()
+        evalModule.getEntropies(guessIDs, possibleIDs, weights, keep=guessIDs[0])
+        peaks[numSolutions] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        'command': 'entropies',
+        'vocabulary': len(guessIDs),
+        'peak_mb': {n: round(peak / 2**20, 2) for n, peak in peaks.items()},
+        'bound_mb': round(bound / 2**20, 2),
+        'bounded': max(peaks.values()) <= bound
+    }
+
+async def replay(command, channels, numRequests, concurrency, storageFolder, seed):
+    rng = random.Random(seed)
+    channelList = list(channels.values())
+    messages = sorted((m for channel in channelList for m in channel.messages), key=lambda m: m.id)
+
+    if command == 'ingest':
+        wordlist = loadModule('wordlist', storageFolder)
+        merchant = loadModule('merchant', storageFolder)
+        for channel in channelList:
+            # channels start live (nothing to catch up on), so every game goes through the listeners
+            wordlist.LIVE_CHANNELS.add(channel.id)
+            merchant.LIVE_CHANNELS.add(channel.id)
+
+        async def handler(i):
+            await wordlist.on_message(messages[i])
+            await merchant.on_message(messages[i])
+        return await runRequests(handler, len(messages), concurrency)
+
+    module = loadModule(COMMAND_MODULES[command], storageFolder)
+    callback = getattr(module, command)
+
+    async def handler(i):
+        if command == 'eval':
+            game = rng.choice(messages)
+            reference = SimpleNamespace(message_id=game.id)
+            ctx = FakeContext(game.channel, FakeMessage(makeSnowflake(i), game.channel, 0, [], reference))
+        else:
+            channel = rng.choice(channelList)
+            ctx = FakeContext(channel, FakeMessage(makeSnowflake(i), channel, 0, []))
+        await callback(ctx)
+    return await runRequests(handler, numRequests, concurrency)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline replay / load test of the Co-ordlyzer commands')
+    parser.add_argument('command', choices=['ingest', 'wordlist', 'merchants', 'stats', 'eval', 'entropies'])
+    parser.add_argument('--replay', help='JSON file of recorded Co-ordle message payloads')
+    parser.add_argument('--games', type=int, default=1000, help='number of synthetic games')
+    parser.add_argument('--channels', type=int, default=4, help='number of synthetic channels')
+    parser.add_argument('--guilds', type=int, default=1, help='number of synthetic servers')
+    parser.add_argument('--users', type=int, default=50, help='number of synthetic users')
+    parser.add_argument('--requests', type=int, default=100, help='number of command calls')
+    parser.add_argument('--concurrency', type=int, default=1, help='max command calls in flight')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--record', help='save the synthetic games to this file, for --replay')
+    args = parser.parse_args(argv)
+
+    if args.command == 'entropies':
+        storageFolder = tempfile.mkdtemp(prefix='coordlyzer-replay-')
+        try:
+            for filename in EVAL_FILES:
+                if os.path.exists(os.path.join(STORAGE_FOLDER, filename)):
+                    shutil.copy(os.path.join(STORAGE_FOLDER, filename), storageFolder)
+            report = getEntropyMemoryReport(storageFolder)
+        finally:
+            shutil.rmtree(storageFolder, ignore_errors=True)
+        print(json.dumps(report, indent=4))
+        if not report['bounded']:
+            raise SystemExit('getEntropies peak memory is over its bound')
+        return
+
+    if args.replay:
+        with open(args.replay) as f:
+            payloads = json.load(f)
+    else:
+        rng = random.Random(args.seed)
+        channelIDs = [rng.randrange(10**17, 10**18) for x in range(args.channels)]
+        guildIDs = [rng.randrange(10**17, 10**18) for x in range(args.guilds)]
+        words, solutions = getReplayWords()
+        payloads = makeSyntheticGames(args.games, channelIDs, guildIDs, words, solutions, args.users, args.seed)
+        if args.record:
+            with open(args.record, 'w+') as f:
+                json.dump(payloads, f)
+    channels = loadGames(payloads)
+
+    storageFolder = tempfile.mkdtemp(prefix='coordlyzer-replay-')
+    try:
+        if args.command == 'eval':
+            for filename in EVAL_FILES:
+                shutil.copy(os.path.join(STORAGE_FOLDER, filename), storageFolder)
+        latencies, elapsed = asyncio.run(
+            replay(args.command, channels, args.requests, args.concurrency, storageFolder, args.seed)
+        )
+    finally:
+        shutil.rmtree(storageFolder, ignore_errors=True)
+
+    print(json.dumps(getReport(args.command, latencies, elapsed), indent=4))
+
+if __name__ == '__main__':
+    main()
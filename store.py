@@ -0,0 +1,98 @@
+'''
+store.py
+
+--- FUNCTION ---
+Shared local store for the state under storage/ (timestamps, wordlists, merchant stats, eval cache),
+safe to use from several bot processes at once (one per shard, and eval.py / wordlist.py / merchant.py
+running side by side).
+    - every write goes to a temporary file that then replaces the original, so readers never see a
+      half-written file and need no lock
+    - read-modify-write sequences run inside transaction(), which holds one exclusive lock over the
+      whole store (STORE_LOCK_FILE), so two processes can't both load a file and overwrite each
+      other's changes
+
+--- USAGE ---
+with transaction():
+    data = loadJson(path)
+    data[key] = value
+    saveJson(path, data)
+'''
+
+import os
+import json
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # not on Windows - transactions then only exclude threads of the same process
+    fcntl = None
+
+# --------- DIRECTORY --------- #
+PROJECT_FOLDER = os.path.dirname(__file__)
+STORAGE_FOLDER = os.path.join(PROJECT_FOLDER, 'storage')
+STORE_LOCK_FILE = os.path.join(STORAGE_FOLDER, 'store.lock')
+
+# --------- CONSTANTS --------- #
+STORE_LOCK = threading.RLock()
+LOCK_STATE = {'depth': 0, 'file': None} # nesting depth of transaction() and the locked file
+
+# --------- FUNCTIONS --------- #
+@contextmanager
+def transaction():
+    '''
+    Holds the store lock for the duration of the block. Transactions can be nested, only the
+    outermost one takes and releases the lock
+    '''
+    with STORE_LOCK:
+        if LOCK_STATE['depth'] == 0 and fcntl is not None:
+            os.makedirs(os.path.dirname(STORE_LOCK_FILE), exist_ok=True)
+            LOCK_STATE['file'] = open(STORE_LOCK_FILE, 'a+')
+            fcntl.flock(LOCK_STATE['file'], fcntl.LOCK_EX)
+        LOCK_STATE['depth'] += 1
+        try:
+            yield
+        finally:
+            LOCK_STATE['depth'] -= 1
+            if LOCK_STATE['depth'] == 0 and LOCK_STATE['file'] is not None:
+                fcntl.flock(LOCK_STATE['file'], fcntl.LOCK_UN)
+                LOCK_STATE['file'].close()
+                LOCK_STATE['file'] = None
+
+def writeFile(path, text):
+    '''
+    Atomically replaces a text file
+
+    Parameters
+        path: file path
+        text: new contents
+    '''
+    tempFile = f'{path}.{os.getpid()}.tmp'
+    with open(tempFile, 'w+') as f:
+        f.write(text)
+    os.replace(tempFile, path)
+
+def loadJson(path):
+    '''
+    Loads JSON file
+
+    Parameter
+        path: JSON file path
+    Return
+        Loaded JSON data (empty dictionary if file not found or empty)
+    '''
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def saveJson(path, data):
+    '''
+    Saves JSON file (atomically, see writeFile)
+
+    Parameter
+        path: JSON file path
+        data: data to save
+    '''
+    writeFile(path, json.dumps(data, indent=4))
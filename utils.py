@@ -0,0 +1,212 @@
+'''
+utils.py
+
+--- FUNCTION ---
+Shared Co-ordle parsing and bot setup for eval.py, wordlist.py and merchant.py.
+parseCoordle() reads everything the bot uses from a finished Co-ordle in one pass over its embed -
+solution, guesses, the guesser of each row, and whether it was solved - from either a discord.Message
+or a raw message payload (dict, as sent by the gateway / returned by the API), and returns a compact
+Coordle record. parseCoordles() does the same for a whole batch (e.g. a channel history backfill).
+makeBot() creates the sharded bot each of them runs, getChannel() resolves the channel of raw events.
+
+--- SHARDING ---
+By default a single process runs every shard Discord recommends (AutoShardedBot). To spread the
+shards over several processes, give each one the total and its own shards through the environment:
+    SHARD_COUNT=4 SHARD_IDS=0,1 python merchant.py
+    SHARD_COUNT=4 SHARD_IDS=2,3 python merchant.py
+All processes share storage/ - see store.py
+
+--- CO-ORDLE EMBED ---
+description: one row per guess, each row being the letter emotes (e.g. :green_a:) followed by a
+             mention of the guesser (<@!userID>)
+color: EMBED_GREEN if solved, EMBED_RED if not
+fields: the second to last field holds the solution (in `backticks`) of unsolved Co-ordles
+'''
+
+import os
+import re
+import discord
+from collections import namedtuple
+from discord.ext import commands
+
+# --------- CONSTANTS --------- #
+EMBED_GREEN = '#78b159' # solved Co-ordle
+EMBED_RED = '#dd2e44' # unsolved Co-ordle
+COORDLE = 1071892566158614608
+
+LETTER_PATTERN = re.compile(r'_([a-zA-Z]):') # letter from emote (e.g. :green_a:)
+GUESSER_PATTERN = re.compile(r'<@!(\d+)>')
+SOLUTION_PATTERN = re.compile(r'`(\w+)`')
+
+Coordle = namedtuple('Coordle', ['id', 'channelID', 'solved', 'solution', 'guesses', 'guessers'])
+
+# --------- FUNCTIONS --------- #
+def makeBot(description):
+    '''
+    Creates the bot, running the shards given by SHARD_COUNT / SHARD_IDS (all of them if unset)
+
+    Parameter
+        description: bot description
+    Return
+        commands.AutoShardedBot
+    '''
+    intents = discord.Intents.default()
+    intents.message_content = True
+
+    shardCount, shardIDs = os.getenv('SHARD_COUNT'), os.getenv('SHARD_IDS')
+    if shardIDs and not shardCount:
+        raise ValueError("SHARD_IDS requires SHARD_COUNT")
+    return commands.AutoShardedBot(
+        command_prefix='?', description=description, intents=intents,
+        shard_count=int(shardCount) if shardCount else None,
+        shard_ids=[int(shardID) for shardID in shardIDs.split(',')] if shardIDs else None
+    )
+
+async def getChannel(bot, channelID):
+    # channel from the bot's cache, fetched if not cached (e.g. for raw events)
+    return bot.get_channel(channelID) or await bot.fetch_channel(channelID)
+
+def getEmbed(message):
+    '''
+    Gets the first embed of a message as (color, description, fields) - color as '#rrggbb',
+    fields as a function returning the list of field values (only built when needed)
+
+    Parameter
+        message: discord.Message or raw message payload
+    Return
+        (color, description, fields), None if the message has no embed
+    '''
+    if isinstance(message, dict):
+        embeds = message.get('embeds')
+        if not embeds:
+            return None
+        embed = embeds[0]
+        color = embed.get('color')
+        color = f'#{color:06x}' if color is not None else None
+        fields = lambda: [field.get('value', '') for field in embed.get('fields', [])]
+        return color, embed.get('description') or '', fields
+
+    if not message.embeds:
+        return None
+    embed = message.embeds[0] # message.embeds returns a list
+    fields = lambda: [field.value for field in embed.fields]
+    return str(embed.color), embed.description or '', fields
+
+def getAuthorID(message):
+    if isinstance(message, dict):
+        return int(message.get('author', {}).get('id', 0))
+    return message.author.id
+
+def isSolvedCoordle(message):
+    '''
+    Determines if a message is a Co-ordle and whether it is solved or unsolved
+
+    Parameter
+        message: discord.Message or raw message payload
+    Returns
+        True: is Co-ordle, solved
+        False: is Co-ordle, unsolved
+        None: not a Co-ordle
+    '''
+    if getAuthorID(message) == COORDLE:
+        embed = getEmbed(message)
+        if embed is not None:
+            if embed[0] == EMBED_GREEN:
+                return True
+            elif embed[0] == EMBED_RED:
+                return False
+    return None
+
+def isUnfinishedCoordle(message):
+    # whether a message is a Co-ordle still being played (embed neither EMBED_GREEN nor EMBED_RED)
+    if getAuthorID(message) != COORDLE:
+        return False
+    embed = getEmbed(message)
+    return embed is not None and embed[0] not in (EMBED_GREEN, EMBED_RED)
+
+def parseCoordle(message):
+    '''
+    Parses a finished Co-ordle in a single pass over its embed
+
+    Parameter
+        message: discord.Message or raw message payload
+    Return
+        Coordle record (None if the message is not a finished Co-ordle)
+            id, channelID: message and channel IDs
+            solved: whether the Co-ordle was solved
+            solution: solution (uppercase)
+            guesses: guess of each row (uppercase)
+            guessers: user ID (str, as in the mention) of each row's guesser (None if the row has no mention)
+    '''
+    if getAuthorID(message) != COORDLE:
+        return None
+    embed = getEmbed(message)
+    if embed is None or embed[0] not in (EMBED_GREEN, EMBED_RED):
+        return None
+    color, description, fields = embed
+    solved = color == EMBED_GREEN
+
+    # every regex runs once over the whole description - rows are only split up when they
+    # are not all the same length with one guesser each
+    description = description.strip()
+    numRows = description.count('\n') + 1
+    letters = ''.join(LETTER_PATTERN.findall(description)).upper()
+    mentions = GUESSER_PATTERN.findall(description)
+    if len(mentions) == numRows and len(letters) % numRows == 0:
+        length = len(letters) // numRows
+        guesses = [letters[i:i + length] for i in range(0, len(letters), length)]
+        guessers = mentions
+    else:
+        rows = description.split('\n')
+        guesses = [''.join(LETTER_PATTERN.findall(row)).upper() for row in rows]
+        mentions = [GUESSER_PATTERN.search(row) for row in rows]
+        guessers = [mention.group(1) if mention else None for mention in mentions]
+
+    if solved:
+        solution = guesses[-1] # i.e. last guess
+    else:
+        fields = fields()
+        found = SOLUTION_PATTERN.search(fields[-2]) if len(fields) >= 2 else None # custom to Co-ordle structure
+        if not found:
+            raise ValueError("Solution not found")
+        solution = found.group(1).upper()
+
+    if isinstance(message, dict):
+        messageID, channelID = int(message['id']), int(message.get('channel_id', 0))
+    else:
+        messageID, channelID = message.id, message.channel.id
+    return Coordle(messageID, channelID, solved, solution, guesses, guessers)
+
+def parseCoordles(messages):
+    '''
+    Parses a batch of messages, skipping any that are not finished Co-ordles
+
+    Parameter
+        messages: list of discord.Message or raw message payloads
+    Return
+        list of Coordle records
+    '''
+    records = (parseCoordle(message) for message in messages)
+    return [record for record in records if record is not None]
+
+def getSolution(coordle):
+    '''
+    Gets solution from solved or unsolved Co-ordle
+
+    Parameter
+        coordle: discord.Message or raw message payload of a finished Co-ordle
+    Return
+        solution (uppercase)
+    '''
+    return parseCoordle(coordle).solution
+
+def getGuesses(coordle):
+    '''
+    Gets guesses from a finished Co-ordle
+
+    Parameter
+        coordle: discord.Message or raw message payload of a finished Co-ordle
+    Return
+        list of guesses (uppercase), in order
+    '''
+    return parseCoordle(coordle).guesses
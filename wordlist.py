@@ -4,6 +4,10 @@ wordlist.py
 /storage (created if doesn't exist)
     timestamps.json: (created if doesn't exist) stores the timestamp (encoded in message ID) 
     of the last Co-ordle retrieved by channel
+    unfinished.json: (created if doesn't exist) stores the message IDs of Co-ordles seen before they
+    finished by channel, so they are still ingested if they finish after the timestamp moved past them
+    pending.json: (created if doesn't exist) stores the number of Co-ordles and of yet unseen solutions
+    ingested by channel since the last ?wordlist call
     /wordlists (created if doesn't exist)
         {channel1ID}.txt
         {channel2ID}.txt
@@ -12,19 +16,30 @@ wordlist.py
 --- EXECUTION FLOW ---
 ?wordlist
     1. getTimestamp() - gets channel-specific timestamp of last Co-ordle retrieved
-    2. getCoordles() - gets all Co-ordles from channel history since timestamp
+    2. getCoordles() - gets all Co-ordles from channel history since timestamp (and the unfinished ones)
     3. getSolutions() - gets solutions from Co-ordles (both solved and unsolved)
     4. updateWordlist() - updates channel-specific wordlist file with any new solutions
     5. updateTimestamp() - updates channel-specific timestamp to that of the most recent Co-ordle
-    6. output - sends embed summarizing number of new Co-ordles and unique solutions found
+    6. popPending() - gets and resets the channel's counts of Co-ordles and unique solutions ingested since
+       the last ?wordlist call (kept in storage, so they survive restarts and are shared by every shard)
+    7. output - sends embed summarizing number of new Co-ordles and unique solutions found
+on_message / on_raw_message_edit (live ingestion)
+    1. isSolvedCoordle() - picks out Co-ordles as they are posted, or edited into a finished state (the
+       raw edit event fires even for messages no longer in the message cache, and its payload is parsed
+       as is)
+    2. first Co-ordle seen in a channel since startup -> syncChannel() runs the ?wordlist steps 1-5 to
+       catch up on anything missed while the bot was down
+    3. after that, each Co-ordle goes straight through getNewCoordles() (which skips Co-ordles already
+       ingested, e.g. edited again after they finished) / updateWordlist() / updateTimestamp(), so
+       ?wordlist only has to report what was already ingested
 '''
 
 import os
-import re
-import json
+import asyncio
 import discord
-from discord.ext import commands
 from dotenv import load_dotenv
+from utils import isSolvedCoordle, isUnfinishedCoordle, parseCoordles, makeBot, getChannel
+from store import loadJson, saveJson, writeFile, transaction
 
 # --------- DIRECTORY --------- #
 # folder paths
@@ -34,15 +49,18 @@ WORDLISTS_FOLDER = os.path.join(STORAGE_FOLDER, "wordlists")
 
 # file paths
 LAST_RETRIEVAL_FILE = os.path.join(STORAGE_FOLDER, 'timestamps.json')
+PENDING_FILE = os.path.join(STORAGE_FOLDER, 'pending.json')
+UNFINISHED_FILE = os.path.join(STORAGE_FOLDER, 'unfinished.json')
 
 # Create folders if they don't exist
 os.makedirs(STORAGE_FOLDER, exist_ok=True)
 os.makedirs(WORDLISTS_FOLDER, exist_ok=True)
 
 # --------- CONSTANTS --------- #
-EMBED_GREEN = '#78b159' # solved Co-ordle
-EMBED_RED = '#dd2e44' # unsolved Co-ordle
-COORDLE = 1071892566158614608
+LIVE_CHANNELS = set() # channels caught up since startup
+SYNC_LOCKS = {}
+DAY_MS = 24 * 60 * 60 * 1000
+UNFINISHED_DAYS = 7 # unfinished Co-ordles this much older than the timestamp are no longer tracked
 
 # load token
 load_dotenv()
@@ -50,31 +68,10 @@ TOKEN = os.getenv('TOKEN')
 
 # --------- BOT SETUP --------- #
 description = 'Analyzes user guesses for the Discord Co-ordle bot'
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix='?', description=description, intents=intents)
+bot = makeBot(description)
 
 # --------- FUNCTIONS --------- #
 # NEW WORDS RETRIEVED
-def isSolvedCoordle(message):
-    '''
-    Determines if a message is a Co-ordle and whether it is solved or unsolved
-    
-    Parameter
-        message: Discord message
-    Returns
-        True: is Co-ordle, solved
-        False: is Co-ordle, unsolved
-        None: not a Co-ordle
-    '''
-    if message.author.id == COORDLE and message.embeds:
-        embed = message.embeds[0] # message.embeds returns a list
-        if str(embed.color) == EMBED_GREEN:
-            return True
-        elif str(embed.color) == EMBED_RED:
-            return False
-    return None
-
 async def getCoordles(channel, timestamp):
     '''
     Gets all Co-ordles from specified timestamp (usu. since last retrieval)
@@ -84,39 +81,17 @@ async def getCoordles(channel, timestamp):
         timestamp: starting timestamp from which to filter messages
     Return
         coordles: list of Co-ordles
+        unfinished: message IDs of Co-ordles not finished yet
     '''
     coordles = []
+    unfinished = []
     async for message in channel.history(after=discord.Object(id=timestamp), limit = None):
         if isSolvedCoordle(message) is not None:
             coordles.append(message)
             #print(f"Found Co-ordle: ID {message.id}, Title: {message.embeds[0].title}") # for debugging
-    return coordles
-
-def loadJson(path):
-    '''
-    Loads JSON file
-
-    Parameter
-        path: JSON file path
-    Return
-        Loaded JSON data (empty dictionary if file not found or empty)
-    '''
-    try:
-        with open(path, "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-def saveJson(path, data):
-    '''
-    Saves JSON file
-
-    Parameter
-        path: JSON file path
-        data: data to save
-    '''
-    with open(path, "w+") as f:
-        json.dump(data, f, indent=4)
+        elif isUnfinishedCoordle(message):
+            unfinished.append(message.id)
+    return coordles, unfinished
 
 def getTimestamp(channel):
     '''
@@ -137,49 +112,17 @@ def updateTimestamp(channel, coordles):
 
     Parameters
         channel: Discord channel
-        coordles: list of coordles
+        coordles: list of Coordle records (see parseCoordle)
     '''
     if coordles:
-        newest = coordles[-1].id  # message ID of most recent Co-ordle
+        newest = max(coordle.id for coordle in coordles)  # message ID of most recent Co-ordle
         channelID = channel.id
         retrievals = loadJson(LAST_RETRIEVAL_FILE)
-        retrievals[str(channelID)] = newest
+        retrievals[str(channelID)] = max(newest, retrievals.get(str(channelID), 0))
         saveJson(LAST_RETRIEVAL_FILE, retrievals)
     else:
         print("No new Co-ordles retrieved")
 
-def getSolved(coordle):
-    '''
-    Gets solution from solved Co-ordle
-
-    Parameter
-        coordle: message containing solved Co-ordle 
-    Return
-        word: solution
-    '''
-    embed = coordle.embeds[0]
-    description = embed.description or ""
-    found = description.strip().split('\n')[-1] # i.e. last guess
-    letters = re.findall(r':\w+_([a-zA-Z]):', found) # gets letters from emotes
-    word = ''.join(letters)
-    return word
-
-def getUnsolved(coordle):
-    '''
-    Gets solution from unsolved Co-ordle
-
-    Parameter
-        coordle: message containing unsolved Co-ordle
-    Return
-        Solution
-    '''
-    embed = coordle.embeds[0]
-    solution = embed.fields[-2].value # custom to Co-ordle structure
-    word = re.search(r'`(\w+)`', solution)
-    if word:
-        return word.group(1)
-    raise ValueError("Solution not found")
-
 def getWordlist(channelID):
     '''
     Loads channel-specific wordlist file from storage folder
@@ -214,27 +157,129 @@ def updateWordlist(channel, words):
     numUnique = len(combined) - len(wordlist)
 
     wordlistFile = os.path.join(WORDLISTS_FOLDER, f"{channelID}.txt")
-    with open(wordlistFile, 'w+') as f:
-        f.write("\n".join(sorted(combined))) 
+    writeFile(wordlistFile, "\n".join(sorted(combined)))
     return numUnique
 
+def addPending(channel, numCoordles, numUnique):
+    '''
+    Adds newly ingested Co-ordles to the channel's counts not yet reported by ?wordlist
+
+    Parameters
+        channel: Discord channel
+        numCoordles: number of Co-ordles ingested
+        numUnique: number of unique solutions found in them
+    '''
+    if numCoordles:
+        channelID = str(channel.id)
+        pending = loadJson(PENDING_FILE)
+        counts = pending.get(channelID, [0, 0])
+        pending[channelID] = [counts[0] + numCoordles, counts[1] + numUnique]
+        saveJson(PENDING_FILE, pending)
+
+def popPending(channel):
+    '''
+    Gets the channel's counts not yet reported by ?wordlist and resets them
+
+    Parameter
+        channel: Discord channel
+    Return
+        [number of Co-ordles, number of unique solutions] ingested since the last ?wordlist call
+    '''
+    with transaction():
+        pending = loadJson(PENDING_FILE)
+        counts = pending.pop(str(channel.id), None)
+        if counts is None:
+            return [0, 0]
+        saveJson(PENDING_FILE, pending)
+    return counts
+
+def addUnfinished(channel, messageIDs):
+    '''
+    Records Co-ordles seen before they finished, so they are still ingested when an edit finishes
+    them after the channel's timestamp has already moved past them (see getNewCoordles)
+
+    Parameters
+        channel: Discord channel
+        messageIDs: message IDs of unfinished Co-ordles
+    '''
+    if messageIDs:
+        channelID = str(channel.id)
+        with transaction():
+            unfinished = loadJson(UNFINISHED_FILE)
+            unfinished[channelID] = sorted(set(unfinished.get(channelID, [])).union(messageIDs))
+            saveJson(UNFINISHED_FILE, unfinished)
+
+def getNewCoordles(channel, coordles):
+    '''
+    Picks out the Co-ordles not ingested yet - those past the channel's timestamp, and older ones
+    only if they were recorded as unfinished (addUnfinished) - so a finished Co-ordle that is
+    edited again is not ingested twice. The picked Co-ordles, and unfinished ones more than
+    UNFINISHED_DAYS older than the timestamp, are no longer tracked as unfinished
+
+    Parameters
+        channel: Discord channel
+        coordles: list of Coordle records (see parseCoordle)
+    Return
+        list of the Coordle records not ingested yet
+    '''
+    timestamp = getTimestamp(channel)
+    channelID = str(channel.id)
+    unfinished = loadJson(UNFINISHED_FILE)
+    pending = set(unfinished.get(channelID, []))
+    coordles = [coordle for coordle in coordles if coordle.id > timestamp or coordle.id in pending]
+
+    cutoff = timestamp - (UNFINISHED_DAYS * DAY_MS << 22)
+    remaining = pending.difference(coordle.id for coordle in coordles)
+    remaining = sorted(messageID for messageID in remaining if messageID > cutoff)
+    if len(remaining) != len(pending):
+        if remaining:
+            unfinished[channelID] = remaining
+        else:
+            del unfinished[channelID]
+        saveJson(UNFINISHED_FILE, unfinished)
+    return coordles
+
 def getSolutions(coordles):
     '''
     Gets solutions from solved and unsolved Co-ordles
 
     Parameter
-        coordles: list of Co-ordle embeds
+        coordles: list of Coordle records (see parseCoordle)
     Return
         solutions: list of solutions
     '''
-    solutions = []
-    for coordle in coordles:
-        if isSolvedCoordle(coordle):
-            solutions.append(getSolved(coordle))
-        else:
-            solutions.append(getUnsolved(coordle))
-    solutions = [word.upper() for word in solutions]
-    return solutions
+    return [coordle.solution for coordle in coordles]
+
+def ingestCoordles(channel, coordles):
+    '''
+    Adds Co-ordles to the channel's wordlist and moves its timestamp past them
+
+    Parameters
+        channel: Discord channel
+        coordles: list of Co-ordles (discord.Message or raw message payloads)
+    '''
+    coordles = parseCoordles(coordles)
+    with transaction():
+        coordles = getNewCoordles(channel, coordles)
+        updateTimestamp(channel, coordles)
+        numUnique = updateWordlist(channel, getSolutions(coordles))
+        addPending(channel, len(coordles), numUnique)
+
+async def syncChannel(channel):
+    '''
+    Catches up on Co-ordles posted since the channel's timestamp (i.e. while the bot was down),
+    once per channel per startup - after that, the listeners keep the channel up to date
+
+    Parameter
+        channel: Discord channel
+    '''
+    async with SYNC_LOCKS.setdefault(channel.id, asyncio.Lock()):
+        if channel.id not in LIVE_CHANNELS:
+            coordles, unfinished = await getCoordles(channel, getTimestamp(channel))
+            with transaction():
+                addUnfinished(channel, unfinished)
+                ingestCoordles(channel, coordles)
+            LIVE_CHANNELS.add(channel.id)
 
 # --------- EXECUTION --------- #
 @bot.event
@@ -242,20 +287,39 @@ async def on_ready():
     print(f'Logged in as {bot.user} (ID: {bot.user.id})')
     print('---------')
 
+@bot.listen('on_message')
+async def on_message(message):
+    if isUnfinishedCoordle(message): # ingested once an edit finishes it
+        addUnfinished(message.channel, [message.id])
+        return
+    if isSolvedCoordle(message) is None:
+        return
+    await syncChannel(message.channel)
+    if message.id > getTimestamp(message.channel): # not already picked up by the catch-up
+        ingestCoordles(message.channel, [message])
+
+@bot.listen('on_raw_message_edit')
+async def on_raw_message_edit(payload):
+    # a Co-ordle that just finished (was not a finished Co-ordle before the edit - if the message
+    # is not cached, getNewCoordles tells whether it was already ingested)
+    before = payload.cached_message
+    if isSolvedCoordle(payload.data) is None or (before is not None and isSolvedCoordle(before) is not None):
+        return
+    channel = await getChannel(bot, payload.channel_id)
+    await syncChannel(channel)
+    ingestCoordles(channel, [payload.data])
+
 @bot.command(name='wordlist')
 async def wordlist(ctx):
     channel = ctx.channel
-    timestamp = getTimestamp(channel)
-    coordles = await getCoordles(channel, timestamp)
-    solutions = getSolutions(coordles)
-    updateTimestamp(channel, coordles)
-    numUnique = updateWordlist(channel, solutions)
+    await syncChannel(channel)
+    numCoordles, numUnique = popPending(channel)
 
     # OUTPUT
     embed = discord.Embed(
         title = "Wordlist Summary",
         description = (
-            f"Found `{len(coordles)}` Co-ordle(s) since the last `?wordlist` call, "
+            f"Found `{numCoordles}` Co-ordle(s) since the last `?wordlist` call, "
             f"`{numUnique}` of which contained a yet unseen solution."
         ),
         color=discord.Color.purple()
@@ -263,4 +327,5 @@ async def wordlist(ctx):
     embed.timestamp = ctx.message.created_at
     await ctx.send(embed=embed)
 
-bot.run(TOKEN)
\ No newline at end of file
+if __name__ == '__main__':
+    bot.run(TOKEN)